@@ -0,0 +1,309 @@
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+import logging
+import threading
+
+from meeting import Meeting
+from meeting_transcript import MeetingTranscript
+from resolution import Resolution
+from resolution_text import ResolutionText
+from text_search import to_tsvector
+from vetocasts import VetoCasts
+
+logger = logging.getLogger("unsc_db_filler")
+
+
+class BulkWriter:
+    """
+    This class collects finished meetings, with their resolutions and veto casts, and writes them
+    to the database in batches.
+
+    Instead of a SELECT and INSERT round trip and a transaction per row, every batch is written with
+    one `INSERT ... ON CONFLICT DO UPDATE` statement per table, in a single transaction.
+    The texts of the meetings and resolutions go to their own tables, in the same transaction.
+    Their words are indexed for full text search (see `TextSearch`) by the same statement.
+    Records which already exist in the database are updated instead of failing the whole meeting.
+
+    The writer is shared by all workers. Whenever `batch_size` meetings are collected,
+    the worker adding the last one flushes the batch to the database.
+    Don't forget to call `flush` when all jobs are processed, to write the last (partial) batch.
+
+    When given, `on_flush` is called with the ids of the meetings of every batch written to the database.
+
+    When the database refuses a batch (e.g. a constraint is violated), the meetings of the batch are written
+    one at a time, so one bad meeting doesn't keep the others out of the database. The meetings which still
+    fail are dropped from the batch, and `on_failed` is called with the id of each, and its error.
+    When the connection to the database fails, the whole batch is kept, so it's written with the next flush.
+    """
+
+    def __init__(self, engine: Engine, batch_size: int = 100, on_flush=None, on_failed=None) -> None:
+        self.engine: Engine = engine
+        self.batch_size: int = batch_size
+        self.on_flush = on_flush
+        self.on_failed = on_failed
+
+        # Keyed on their unique ids, so a record added twice only ends up once in a batch.
+        # PostgreSQL refuses an INSERT ... ON CONFLICT that touches the same row twice.
+        self.meetings: dict = {}
+        self.transcripts: dict = {}
+        self.resolutions: dict = {}
+        self.resolution_texts: dict = {}
+        self.veto_casts: dict = {}
+        # The meeting which added each veto cast, for when the meetings are written one at a time
+        self.veto_cast_meetings: dict = {}
+
+        self.lock: threading.Lock = threading.Lock()
+
+    def add(self, meeting: Meeting, resolutions: list, veto_casts: list) -> None:
+        """
+        Adds a finished meeting with all its resolutions and veto casts to the current batch.
+        Flushes the batch if it is full.
+
+        :param meeting: the Meeting
+        :param resolutions: the Resolutions discussed in the meeting
+        :param veto_casts: the VetoCasts on the vetoed resolutions of the meeting
+        """
+        with self.lock:
+            self.meetings[meeting.meeting_id] = self.meeting_row(meeting)
+            self.transcripts[meeting.meeting_id] = self.transcript_row(meeting)
+
+            for resolution in resolutions:
+                self.resolutions[resolution.draft_id] = self.resolution_row(resolution)
+                self.resolution_texts[resolution.draft_id] = self.resolution_text_row(resolution)
+
+            for veto_cast in veto_casts:
+                row = self.veto_cast_row(veto_cast)
+                key = (row["vetoed_resolution"], row["state_id"])
+                self.veto_casts[key] = row
+                self.veto_cast_meetings[key] = meeting.meeting_id
+
+            if len(self.meetings) >= self.batch_size:
+                self._flush()
+
+    def flush(self) -> None:
+        """
+        Writes all collected records to the database.
+        """
+        with self.lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        """
+        Writes all collected records to the database. The caller must hold the lock.
+
+        If the connection to the database fails, the records are kept, so they'll be written with the next flush.
+        If the database refuses the batch, the meetings are written one at a time instead.
+        """
+        if len(self.meetings) == 0:
+            return
+
+        logger.info(
+            "Writing %s meetings, %s resolutions and %s veto casts to the DB - BEGIN",
+            len(self.meetings),
+            len(self.resolutions),
+            len(self.veto_casts),
+        )
+
+        try:
+            with self.engine.begin() as connection:
+                self.write(
+                    connection,
+                    list(self.meetings.values()),
+                    list(self.transcripts.values()),
+                    list(self.resolutions.values()),
+                    list(self.resolution_texts.values()),
+                    list(self.veto_casts.values()),
+                )
+            written = list(self.meetings.keys())
+        except (OperationalError, InterfaceError):
+            raise
+        except Exception as e:
+            logger.warning(
+                "Writing %s meetings to the DB failed, writing them one at a time: %s",
+                len(self.meetings),
+                e,
+            )
+            written = self.write_one_at_a_time()
+
+        logger.info("Writing %s meetings to the DB - END", len(written))
+
+        if self.on_flush is not None and len(written) > 0:
+            self.on_flush(written)
+
+        self.meetings.clear()
+        self.transcripts.clear()
+        self.resolutions.clear()
+        self.resolution_texts.clear()
+        self.veto_casts.clear()
+        self.veto_cast_meetings.clear()
+
+    def write_one_at_a_time(self) -> list:
+        """
+        Writes the meetings of the batch one at a time, each with its transcript, resolutions and veto casts,
+        in a transaction of its own. The caller must hold the lock.
+
+        :return: the ids of the meetings which were written. `on_failed` is called for the others
+        """
+        records = self.by_meeting()
+        written = []
+        tried = []
+        for meeting_id, (draft_ids, veto_cast_keys) in records.items():
+            try:
+                with self.engine.begin() as connection:
+                    self.write(
+                        connection,
+                        [self.meetings[meeting_id]],
+                        [self.transcripts[meeting_id]],
+                        [self.resolutions[draft_id] for draft_id in draft_ids],
+                        [self.resolution_texts[draft_id] for draft_id in draft_ids],
+                        [self.veto_casts[key] for key in veto_cast_keys],
+                    )
+                written.append(meeting_id)
+            except (OperationalError, InterfaceError):
+                # Keep the meetings not tried yet, the connection might be back with the next flush
+                if self.on_flush is not None and len(written) > 0:
+                    self.on_flush(written)
+                self.drop(tried, records)
+                raise
+            except Exception as e:
+                logger.error("!!! Failed writing meeting %s to the DB: %s !!!", meeting_id, e)
+                if self.on_failed is not None:
+                    self.on_failed(meeting_id, e)
+            tried.append(meeting_id)
+
+        return written
+
+    def by_meeting(self) -> dict:
+        """
+        :return: for every meeting of the batch, the draft ids of its resolutions and the keys of its veto casts
+        """
+        # A resolution goes with the meeting it was last added by, like in the batch
+        records = {meeting_id: ([], []) for meeting_id in self.meetings}
+        for draft_id, row in self.resolutions.items():
+            records[row["meeting_id"]][0].append(draft_id)
+        for key in self.veto_casts:
+            resolution = self.resolutions.get(key[0])
+            if resolution is not None:
+                records[resolution["meeting_id"]][1].append(key)
+            else:
+                records[self.veto_cast_meetings[key]][1].append(key)
+        return records
+
+    def drop(self, meeting_ids: list, records: dict) -> None:
+        """
+        Removes meetings, with their transcripts, resolutions and veto casts, from the batch.
+
+        :param meeting_ids: the ids of the meetings to remove
+        :param records: the records of every meeting, see `by_meeting`
+        """
+        for meeting_id in meeting_ids:
+            draft_ids, veto_cast_keys = records[meeting_id]
+            del self.meetings[meeting_id]
+            del self.transcripts[meeting_id]
+            for draft_id in draft_ids:
+                del self.resolutions[draft_id]
+                del self.resolution_texts[draft_id]
+            for key in veto_cast_keys:
+                del self.veto_casts[key]
+                del self.veto_cast_meetings[key]
+
+    def write(
+        self,
+        connection: Connection,
+        meetings: list,
+        transcripts: list,
+        resolutions: list,
+        resolution_texts: list,
+        veto_casts: list,
+    ) -> None:
+        # Order matters: resolutions and transcripts refer to meetings,
+        # veto casts and resolution texts refer to resolutions.
+        connection.execute(self.upsert(Meeting, meetings, ["meeting_id"]))
+        connection.execute(self.upsert(MeetingTranscript, transcripts, ["meeting_id"]))
+        if len(resolutions) > 0:
+            connection.execute(self.upsert(Resolution, resolutions, ["draft_id"]))
+            connection.execute(self.upsert(ResolutionText, resolution_texts, ["draft_id"]))
+        if len(veto_casts) > 0:
+            connection.execute(
+                insert(VetoCasts.__table__)
+                .values(veto_casts)
+                .on_conflict_do_nothing(index_elements=["vetoed_resolution", "state_id"])
+            )
+
+    @staticmethod
+    def upsert(model, rows: list, index_elements: list):
+        """
+        Builds an `INSERT ... ON CONFLICT DO UPDATE` statement for the given rows.
+
+        :param model: the ORM class of the table to write to
+        :param rows: the rows (as dicts) to write
+        :param index_elements: the columns of the unique constraint to detect conflicts on
+        :return: the statement
+        """
+        statement = insert(model.__table__).values(rows)
+        return statement.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={
+                column: statement.excluded[column]
+                for column in rows[0].keys()
+                if column not in index_elements
+            },
+        )
+
+    @staticmethod
+    def meeting_row(meeting: Meeting) -> dict:
+        return {
+            "meeting_id": meeting.meeting_id,
+            "topic": meeting.topic,
+            "url": meeting.url,
+            "date": meeting.date,
+            "year": meeting.year,
+            "veto_used_in_meeting": meeting.veto_used_in_meeting,
+        }
+
+    @staticmethod
+    def resolution_row(resolution: Resolution) -> dict:
+        # The meeting_id is normally only filled in by the ORM when flushing the session,
+        # so we take it from the related meeting ourselves.
+        return {
+            "draft_id": resolution.draft_id,
+            "final_id": resolution.final_id,
+            "draft_url": resolution.draft_url,
+            "final_url": resolution.final_url,
+            "status": resolution.status,
+            "year": resolution.year,
+            "meeting_id": resolution.meeting.meeting_id,
+        }
+
+    @staticmethod
+    def transcript_row(meeting: Meeting) -> dict:
+        # The texts are stored as they are encoded by the text codec, plain or compressed
+        transcript = meeting.transcript
+        return {
+            "meeting_id": meeting.meeting_id,
+            "full_text": transcript.full_text,
+            "full_text_compressed": transcript.full_text_compressed,
+            "full_text_tsv": to_tsvector(transcript.text),
+        }
+
+    @staticmethod
+    def resolution_text_row(resolution: Resolution) -> dict:
+        text = resolution.text
+        return {
+            "draft_id": resolution.draft_id,
+            "draft_text": text.draft_text,
+            "final_text": text.final_text,
+            "draft_text_compressed": text.draft_text_compressed,
+            "final_text_compressed": text.final_text_compressed,
+            "draft_text_tsv": to_tsvector(text.draft),
+            "final_text_tsv": to_tsvector(text.final),
+        }
+
+    @staticmethod
+    def veto_cast_row(veto_cast: VetoCasts) -> dict:
+        return {
+            "vetoed_resolution": veto_cast.vetoed_resolution,
+            "state_id": veto_cast.state_id,
+        }
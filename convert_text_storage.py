@@ -0,0 +1,130 @@
+"""
+Converts the meeting transcripts and resolution texts in the database to another text storage mode
+(see `TextCodec`): plain text, or gzip or zstd compressed. E.g. to compress all texts with zstd:
+
+    $ python convert_text_storage.py zstd
+
+Texts already stored the requested way are left alone, so it can be run again after an interruption.
+"""
+from dotenv import load_dotenv
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+import argparse
+import logging
+import os
+
+from dbconnection import DBConnection
+from migrations import Migrations
+from text_codec import TextCodec, MODES
+
+logger = logging.getLogger("unsc_db_filler")
+
+# The text tables: their id column, and the plain and compressed column of each of their texts
+TEXT_TABLES = [
+    ("meeting_transcript", "meeting_id", [("full_text", "full_text_compressed")]),
+    (
+        "resolution_text",
+        "draft_id",
+        [("draft_text", "draft_text_compressed"), ("final_text", "final_text_compressed")],
+    ),
+]
+
+
+def convert_table(
+    engine: Engine, codec: TextCodec, table: str, id_column: str, columns: list, batch_size: int
+) -> int:
+    """
+    Converts all texts of a table, `batch_size` rows per transaction.
+    Rows whose texts are all stored the requested way already are skipped. A missing text (e.g. the final text
+    of a draft which was not adopted) is stored the same way in every mode, so it never needs converting.
+
+    :return: the amount of rows which changed
+    """
+    selected = ", ".join(f"{plain}, {compressed}" for plain, compressed in columns)
+    select = text(
+        f"SELECT {id_column}, {selected} FROM {table} "
+        f"WHERE {id_column} > :last ORDER BY {id_column} LIMIT :limit"
+    )
+    assignments = ", ".join(
+        f"{plain} = :{plain}, {compressed} = :{compressed}" for plain, compressed in columns
+    )
+    update = text(f"UPDATE {table} SET {assignments} WHERE {id_column} = :id")
+
+    converted = 0
+    last = ""
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(select, {"last": last, "limit": batch_size}).all()
+            if len(rows) == 0:
+                return converted
+
+            updates = []
+            for row in rows:
+                stored = [(row[1 + 2 * i], row[2 + 2 * i]) for i in range(len(columns))]
+                if all(
+                    texts == (None, None) or TextCodec.mode_of(*texts) == codec.mode
+                    for texts in stored
+                ):
+                    continue
+
+                values = {"id": row[0]}
+                for (plain, compressed), texts in zip(columns, stored):
+                    values[plain], values[compressed] = codec.encode(TextCodec.decode(*texts))
+                updates.append(values)
+
+            if len(updates) > 0:
+                connection.execute(update, updates)
+
+            converted += len(updates)
+            last = rows[-1][0]
+            logger.info("%s: converted %s rows, up to '%s'", table, converted, last)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("mode", help="The text storage mode to convert to", choices=MODES)
+    parser.add_argument(
+        "--level",
+        help="The compression level (defaults to the default of the format)",
+        action="store",
+        type=int,
+    )
+    parser.add_argument(
+        "--batch-size",
+        help="The amount of rows to convert in one transaction",
+        action="store",
+        type=int,
+        default=200,
+    )
+    args = parser.parse_args()
+
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.StreamHandler())
+
+    codec = TextCodec(args.mode, args.level)
+
+    load_dotenv("Database/database.env")
+    db_connection = DBConnection(
+        host=os.getenv("POSTGRES_HOSTNAME"),
+        dbname=os.getenv("POSTGRES_DB"),
+        user=os.getenv("POSTGRES_USER"),
+        password=os.getenv("POSTGRES_PASSWORD"),
+        pool_size=1,
+    )
+    engine = db_connection.get_engine()
+
+    # Databases created before the compressed storage mode existed miss the compressed columns
+    Migrations(engine).migrate()
+    for table, id_column, columns in TEXT_TABLES:
+        convert_table(engine, codec, table, id_column, columns, args.batch_size)
+
+    # PostgreSQL only gives the space of the old rows back to the OS with a full vacuum
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        for table, id_column, columns in TEXT_TABLES:
+            logger.info("Vacuuming %s", table)
+            connection.execute(text(f"VACUUM FULL ANALYZE {table}"))
+
+
+if __name__ == "__main__":
+    main()
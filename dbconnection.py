@@ -1,8 +1,8 @@
 from sqlalchemy import create_engine
 
 from sqlalchemy.engine import Engine
-from sqlalchemy.orm import declarative_base, sessionmaker, Session
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import QueuePool
 
 import logging
 
@@ -12,25 +12,41 @@ Base = declarative_base()
 
 
 class DBConnection:
-    def __init__(self, host: str, dbname: str, user: str, password: str) -> None:
+    """
+    Holds the connection pool to the database.
+
+    Size the pool (`pool_size`) to the amount of threads using the database,
+    so every one of them can hold a connection at the same time.
+
+    It does not create the tables: the schema is created and kept up to date by `Migrations`.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        dbname: str,
+        user: str,
+        password: str,
+        pool_size: int = 5,
+        max_overflow: int = 2,
+        echo: bool = False,
+    ) -> None:
         self.host: str = host
         self.dbname: str = dbname
         self.user: str = user
         self.password: str = password
         self.engine: Engine = create_engine(
             f"postgresql+psycopg2://{user}:{password}@{host}/{dbname}",
-            echo=True,
-            poolclass=StaticPool,
+            echo=echo,
+            poolclass=QueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_pre_ping=True,
         )
-        self.session: Session = sessionmaker(bind=self.engine)()
-        Base.metadata.create_all(self.engine)
 
     @property
     def connection_string(self) -> str:
         return f"host={self.host} dbname={self.dbname} user={self.user} password={self.password}"
 
-    def get_session(self) -> Session:
-        return self.session
-
     def get_engine(self) -> Engine:
         return self.engine
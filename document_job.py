@@ -0,0 +1,50 @@
+from urllib.parse import urlparse
+
+from job import Job
+
+
+class DocumentJob(Job):
+    """
+    A Document job is a PDF (a meeting transcript, or a draft or adopted resolution) needed to build a meeting.
+    It is first downloaded, after which its text is extracted and handed to `add_text`,
+    for example `Meeting.add_meeting_transcript` or `Resolution.add_draft_text`.
+
+    It belongs to a `MeetingBuildJob`, which keeps track of the documents of the meeting still to be done.
+    It can be enqueued to a `Queue` instance for retrying when failing.
+
+    """
+
+    def __init__(
+        self,
+        build_job,
+        document_id: str,
+        downloader,
+        add_text,
+        uri: str = None,
+        description: str = "",
+    ) -> None:
+        super().__init__(description=description)
+        self.build_job = build_job
+        self.document_id: str = document_id
+        self.downloader = downloader
+        self.add_text = add_text
+        self.uri: str = uri
+        # The file the PDF was downloaded to
+        self.pdf: str = None
+
+    @property
+    def meeting_job(self):
+        return self.build_job.meeting_job
+
+    def info(self):
+        return f"{self.document_id} of meeting {self.build_job.info()}"
+
+    def host(self) -> str:
+        # Once downloaded, the rest of the work on the document is local
+        if self.pdf is not None:
+            return None
+
+        return urlparse(self.uri or "http://www.undocs.org").hostname
+
+    def __repr__(self) -> str:
+        return f"Job for document {self.document_id} of meeting {self.build_job.info()}"
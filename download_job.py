@@ -1,3 +1,5 @@
+from urllib.parse import urlparse
+
 from job import Job
 
 
@@ -16,5 +18,8 @@ class DownloadJob(Job):
     def info(self):
         return f"Job for {self.description} from {self.url} to {self.dest_file}"
 
+    def host(self) -> str:
+        return urlparse(self.url).hostname
+
     def __repr__(self) -> str:
         return f"Job for {self.description} from {self.url} to {self.dest_file}"
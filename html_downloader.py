@@ -1,14 +1,25 @@
+import aiohttp
+import asyncio
+import json
 import logging
+import os
 import requests
+import threading
 
 from download_job import DownloadJob
 from job_queue import JobQueue
+from rate_limiter import RateLimiter
+from retry_policy import CircuitBreaker
+from retry_policy import TRANSIENT, classify_status
 
 logger = logging.getLogger("unsc_db_filler")
 
 
 class DownloadFailed(Exception):
-    pass
+    def __init__(self, message: str, error_class: str = TRANSIENT) -> None:
+        super().__init__(message)
+        # See `retry_policy.classify`
+        self.error_class: str = error_class
 
 
 class HTMLDownloader:
@@ -18,22 +29,74 @@ class HTMLDownloader:
 
     This class uses a Job Queue since the un.org web servers frequently give random errors.
 
+    Pages can be downloaded one after another (`use_async=False`), or concurrently in an asyncio
+    event loop, with at most `concurrency` connections to the same host.
+    Either way, connections are kept alive and reused between pages.
+
+    For every page we downloaded, we keep its `ETag` and `Last-Modified` headers in a small manifest
+    next to the downloaded pages. When we download a page again, we send them along, so the
+    un.org web servers only send us the page again if it changed. Unless `refresh` is set: then all pages
+    are downloaded in full again.
+
+    Every request goes through a `RateLimiter`, by default the one shared by all downloaders.
     """
 
-    def __init__(self, path: str = "./", since: int = 1946, until: int = 2021) -> None:
+    MANIFEST_FILE = "scact_manifest.json"
+
+    def __init__(
+        self,
+        path: str = "./",
+        since: int = 1946,
+        until: int = 2021,
+        use_async: bool = False,
+        concurrency: int = 8,
+        rate_limiter: RateLimiter = None,
+        refresh: bool = False,
+        breaker: CircuitBreaker = None,
+    ) -> None:
         self.path = path
         self.since = since
         self.until = until
-        self.job_queue = JobQueue()
+        self.use_async = use_async
+        self.concurrency = concurrency
+        self.refresh = refresh
+        self.job_queue = JobQueue(breaker=breaker)
+        self.rate_limiter = (
+            rate_limiter if rate_limiter is not None else RateLimiter.shared()
+        )
+
+        self.session = requests.Session()
+        self.manifest_lock = threading.Lock()
+        self.manifest = self.read_manifest()
+
+    def fetch_all_tables(self) -> None:
+        """
+        Fetches all the UN Meeting tables webpages and the veto table in one go.
+        """
+        self.enqueue_meeting_tables()
+        self.enqueue_veto_table()
+        self.process_jobs()
 
     def fetch_meeting_tables(self) -> None:
         """
         Fetches all the UN Meeting tables webpages between the year `self.since`
         and `self.until` to the location `self.path`.
+        """
+        self.enqueue_meeting_tables()
+        self.process_jobs()
 
-        :param since: The first year to fetch the tables for
-        :param until: The last year to fetch the tables for
-        :return:
+    def fetch_veto_table(self) -> None:
+        """
+        Enqueues the download job for downloading the veto table from the UNSC website,
+        and starts processing it
+        """
+        self.enqueue_veto_table()
+        self.process_jobs()
+
+    def enqueue_meeting_tables(self) -> None:
+        """
+        Enqueues the download jobs for all the UN Meeting tables webpages between the year `self.since`
+        and `self.until`.
         """
         for year in range(self.since, self.until):
             # Some pages on the UN website end with .html, others with .htm...
@@ -84,12 +147,9 @@ class HTMLDownloader:
 
                 self.job_queue.enqueue(download_job)
 
-        self.job_queue.process(self.download)
-
-    def fetch_veto_table(self) -> None:
+    def enqueue_veto_table(self) -> None:
         """
-        Enqueues the download job for downloading the veto table from the UNSC website,
-        and starts processing it
+        Enqueues the download job for downloading the veto table from the UNSC website
         """
         url = "https://www.un.org/depts/dhl/resguide/scact_veto_table_en.htm"
 
@@ -99,7 +159,17 @@ class HTMLDownloader:
             description=f"UNSC Veto Table",
         )
         self.job_queue.enqueue(download_job)
-        self.job_queue.process(self.download)
+
+    def process_jobs(self) -> None:
+        """
+        Processes all the queued download jobs, and saves the manifest afterwards.
+        """
+        if self.use_async:
+            asyncio.run(self.process_async())
+        else:
+            self.job_queue.process(self.download)
+
+        self.write_manifest()
 
     def download(self, job: DownloadJob) -> None:
         """
@@ -113,26 +183,167 @@ class HTMLDownloader:
 
         # No try..except here.. let it crash...
         # the job queue processing jobs needs to know when it failed
-        res = self.fetch_url(job.url)
+        res = self.fetch_url(job.url, headers=self.conditional_headers(job))
 
         logger.info("Downloading %s - END", job.info())
 
-        if res.status_code == 200:
+        if res.status_code == 304:
+            logger.info("%s did not change since the last download", job.info())
+        elif res.status_code == 200:
             self.write_to_disk(content=res.text, file=job.dest_file)
+            self.update_manifest(job, res.headers)
+        else:
+            raise DownloadFailed(
+                f"Unable to download the html file for {job.dest_file}...status code was {res.status_code}",
+                error_class=classify_status(res.status_code),
+            )
+
+    async def process_async(self) -> None:
+        """
+        Processes all the queued download jobs concurrently.
+        Failed jobs are retried the same way as when they're processed one after another.
+        """
+        connector = aiohttp.TCPConnector(limit_per_host=self.concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+
+            async def worker() -> None:
+                while True:
+                    job = self.job_queue.take(block=False)
+                    if job is None:
+                        if self.job_queue.drained():
+                            return
+                        # Other workers are still busy, and might put a failed job back.
+                        await asyncio.sleep(0.1)
+                        continue
+
+                    try:
+                        logger.info("Trying time %s for job %s", job.attempts, job)
+                        await self.download_async(session, job)
+                        job.complete = True
+                    except Exception as e:
+                        logger.info(
+                            "Failed to process job '%s': %s .. retrying later",
+                            job.info(),
+                            e,
+                        )
+                        self.job_queue.finish(job, succeeded=False, error=e)
+                    else:
+                        self.job_queue.finish(job, succeeded=True)
+
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+
+    async def download_async(
+        self, session: aiohttp.ClientSession, job: DownloadJob
+    ) -> None:
+        """
+        Same as `download`, but through an aiohttp session
+
+        :param session: the aiohttp session to download with
+        :param job: the DownloadJob we use to download the real data we need
+        """
+        logger.info("Downloading %s - BEGIN", job.info())
+
+        await self.rate_limiter.acquire_async(job.url)
+        async with session.get(job.url, headers=self.conditional_headers(job)) as res:
+            content = await res.read()
+        self.rate_limiter.record(job.url, res.status)
+
+        logger.info("Downloading %s - END", job.info())
+
+        if res.status == 304:
+            logger.info("%s did not change since the last download", job.info())
+        elif res.status == 200:
+            # Decode the page the same way `requests` does in `download`
+            encoding = requests.utils.get_encoding_from_headers(res.headers) or "utf-8"
+            self.write_to_disk(
+                content=content.decode(encoding, errors="replace"), file=job.dest_file
+            )
+            self.update_manifest(job, res.headers)
         else:
             raise DownloadFailed(
-                f"Unable to download the html file for {job.dest_file}...status code was {res.status_code}"
+                f"Unable to download the html file for {job.dest_file}...status code was {res.status}",
+                error_class=classify_status(res.status),
             )
 
-    def fetch_url(self, url: str) -> requests.Response:
+    def fetch_url(self, url: str, headers: dict = None) -> requests.Response:
         """
         Fetch a given url and return a requests Response
 
         :param url: the URL we want to fetch
+        :param headers: extra headers to send along
         :return:    the requests Response
         """
         logger.info("Fetching %s", url)
-        return requests.get(url)
+        self.rate_limiter.acquire(url)
+        res = self.session.get(url, headers=headers)
+        self.rate_limiter.record(url, res.status_code)
+
+        return res
+
+    def conditional_headers(self, job: DownloadJob) -> dict:
+        """
+        Returns the headers to only download a page if it changed since the last time we downloaded it.
+
+        :param job: the DownloadJob for the page
+        :return: the `If-None-Match` and `If-Modified-Since` headers, if we know them
+        """
+        # If the page is not on disk (anymore), or we're asked to, we download it in full.
+        if self.refresh or not os.path.exists(f"{self.path}/{job.dest_file}"):
+            return {}
+
+        with self.manifest_lock:
+            entry = self.manifest.get(job.dest_file)
+
+        if entry is None or entry.get("url") != job.url:
+            return {}
+
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        return headers
+
+    def update_manifest(self, job: DownloadJob, headers) -> None:
+        """
+        Remembers the `ETag` and `Last-Modified` headers of a downloaded page
+
+        :param job: the DownloadJob for the page
+        :param headers: the response headers of the download
+        """
+        with self.manifest_lock:
+            self.manifest[job.dest_file] = {
+                "url": job.url,
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+            }
+
+    def read_manifest(self) -> dict:
+        """
+        Reads the manifest of previously downloaded pages
+
+        :return: the manifest, mapping a downloaded file to its url, `ETag` and `Last-Modified` headers
+        """
+        manifest_file = f"{self.path}/{self.MANIFEST_FILE}"
+        if not os.path.exists(manifest_file):
+            return {}
+
+        try:
+            with open(manifest_file, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.info("Ignoring unreadable manifest '%s': %s", manifest_file, e)
+            return {}
+
+    def write_manifest(self) -> None:
+        """
+        Writes the manifest of downloaded pages to disk
+        """
+        manifest_file = f"{self.path}/{self.MANIFEST_FILE}"
+        with self.manifest_lock:
+            with open(manifest_file, "w") as f:
+                json.dump(self.manifest, f, indent=2, sort_keys=True)
 
     def write_to_disk(self, content: str, file: str) -> None:
         """
@@ -0,0 +1,67 @@
+from sqlalchemy import literal, select, union_all
+from sqlalchemy.engine import Engine
+
+import logging
+
+from meeting import Meeting
+from resolution import Resolution
+
+logger = logging.getLogger("unsc_db_filler")
+
+
+class IngestedRecords:
+    """
+    This class knows which meetings and draft resolutions of a range of years are in the DB already.
+
+    They are read in a single query when loading, so deciding whether a meeting still needs processing
+    needs no database reads at all. Like that, we can skip the meetings we have before downloading anything.
+    """
+
+    def __init__(self, engine: Engine) -> None:
+        self.engine: Engine = engine
+        self.meeting_ids: frozenset = frozenset()
+        self.draft_ids: frozenset = frozenset()
+
+    def load(self, since: int, until: int) -> "IngestedRecords":
+        """
+        Reads the ids of the meetings and draft resolutions of the given years from the DB.
+
+        :param since: the first year to read
+        :param until: the year to stop reading at (not included)
+        :return: the loaded records itself
+        """
+        statement = union_all(
+            select(literal("meeting"), Meeting.meeting_id).where(
+                Meeting.year >= since, Meeting.year < until
+            ),
+            select(literal("resolution"), Resolution.draft_id).where(
+                Resolution.year >= since, Resolution.year < until
+            ),
+        )
+
+        with self.engine.connect() as connection:
+            rows = connection.execute(statement).all()
+
+        self.meeting_ids = frozenset(id for kind, id in rows if kind == "meeting")
+        self.draft_ids = frozenset(id for kind, id in rows if kind == "resolution")
+        logger.info(
+            "Found %s meetings and %s draft resolutions of %s until %s in the DB",
+            len(self.meeting_ids),
+            len(self.draft_ids),
+            since,
+            until,
+        )
+
+        return self
+
+    def has(self, meeting_id: str, draft_ids: list) -> bool:
+        """
+        Checks if a meeting, and all the draft resolutions discussed in it, are in the DB already.
+
+        :param meeting_id: the id of the meeting
+        :param draft_ids: the ids of the draft resolutions discussed in the meeting
+        :return: True if there's nothing left to add for the meeting
+        """
+        return meeting_id in self.meeting_ids and all(
+            draft_id in self.draft_ids for draft_id in draft_ids
+        )
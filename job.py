@@ -11,11 +11,23 @@ class Job(ABC):
         self.complete: bool = False
         self.attempts: int = 1
         self.description: str = description
+        # The job is not retried before this time (see `JobQueue.finish`)
+        self.not_before: float = 0
+        # The class of the error the job last failed with (see `retry_policy.classify`)
+        self.error_class: str = None
+        # The host of the job when it was last taken from a queue (see `JobQueue.take`)
+        self.taken_host: str = None
 
     @abstractmethod
     def info(self):
         pass
 
+    def host(self) -> str:
+        """
+        :return: the host processing this job talks to, or None if it doesn't talk to any host
+        """
+        return None
+
     @property
     def complete(self):
         return self._complete
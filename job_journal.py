@@ -0,0 +1,206 @@
+from datetime import datetime
+
+import json
+import logging
+import sqlite3
+import threading
+
+from meeting_job import MeetingJob
+
+logger = logging.getLogger("unsc_db_filler")
+
+
+class JobJournal:
+    """
+    This class keeps track of the state of every Meeting Job in a SQLite database on disk.
+
+    For every meeting it records:
+     - the meeting record the job was created from (record)
+     - its state: queued, running, done or failed (state)
+     - how many times processing it (or one of its documents) was tried (attempts)
+     - the last error processing it gave (last_error)
+     - when it was queued, started and finished (queued_at, started_at, finished_at)
+
+    Every change is committed right away. When the loader crashes or is stopped, the journal knows
+    exactly which meetings still need to be processed (see `unfinished`), and which failed and why (see `find`).
+
+    The journal is thread-safe, one instance can be shared by all workers.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    def __init__(self, db_file: str) -> None:
+        self.db_file: str = db_file
+        self.lock: threading.Lock = threading.Lock()
+        self.connection = sqlite3.connect(db_file, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+
+        with self.lock, self.connection:
+            # Write-ahead logging keeps the journal intact when we crash halfway a write
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS meeting_job (
+                    meeting_id TEXT PRIMARY KEY,
+                    year INTEGER,
+                    record TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    queued_at TEXT,
+                    started_at TEXT,
+                    finished_at TEXT
+                )
+                """
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS meeting_job_state_idx ON meeting_job (state)"
+            )
+
+        logger.info("Using job journal '%s'", self.db_file)
+
+    def queued(self, jobs: list) -> None:
+        """
+        Records jobs being queued. A job that was in the journal before, starts over.
+
+        :param jobs: the queued Meeting Jobs
+        """
+        now = self.now()
+        with self.lock, self.connection:
+            self.connection.executemany(
+                """
+                INSERT INTO meeting_job (meeting_id, year, record, state, attempts, queued_at)
+                VALUES (?, ?, ?, ?, 0, ?)
+                ON CONFLICT (meeting_id) DO UPDATE SET
+                    year = excluded.year,
+                    record = excluded.record,
+                    state = excluded.state,
+                    attempts = 0,
+                    last_error = NULL,
+                    queued_at = excluded.queued_at,
+                    started_at = NULL,
+                    finished_at = NULL
+                """,
+                [
+                    (
+                        job.info(),
+                        job.meeting_record.get("year"),
+                        json.dumps(job.meeting_record),
+                        self.QUEUED,
+                        now,
+                    )
+                    for job in jobs
+                ],
+            )
+
+    def started(self, job: MeetingJob) -> None:
+        """
+        Records an attempt to process (part of) a job.
+
+        :param job: the Meeting Job being processed
+        """
+        self.execute(
+            """
+            UPDATE meeting_job
+            SET state = ?, attempts = attempts + 1, started_at = COALESCE(started_at, ?)
+            WHERE meeting_id = ?
+            """,
+            (self.RUNNING, self.now(), job.info()),
+        )
+
+    def errored(self, job: MeetingJob, error: Exception) -> None:
+        """
+        Records an error processing (part of) a job. The job might still be retried.
+
+        :param job: the Meeting Job which gave an error
+        :param error: the error
+        """
+        self.execute(
+            "UPDATE meeting_job SET last_error = ? WHERE meeting_id = ?",
+            (f"{type(error).__name__}: {error}", job.info()),
+        )
+
+    def done(self, meeting_ids: list) -> None:
+        """
+        Records meetings being written to the database.
+
+        :param meeting_ids: the ids of the meetings written to the database
+        """
+        now = self.now()
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "UPDATE meeting_job SET state = ?, finished_at = ? WHERE meeting_id = ?",
+                [(self.DONE, now, meeting_id) for meeting_id in meeting_ids],
+            )
+
+    def failed(self, job: MeetingJob) -> None:
+        """
+        Records a job which failed, after all its retries.
+
+        :param job: the failed Meeting Job
+        """
+        self.execute(
+            "UPDATE meeting_job SET state = ?, finished_at = ? WHERE meeting_id = ?",
+            (self.FAILED, self.now(), job.info()),
+        )
+
+    def write_failed(self, meeting_id: str, error: Exception) -> None:
+        """
+        Records a meeting which the database refused to write. Retrying it won't help until the cause is fixed.
+
+        :param meeting_id: the id of the meeting
+        :param error: the error the database gave
+        """
+        self.execute(
+            "UPDATE meeting_job SET state = ?, last_error = ?, finished_at = ? WHERE meeting_id = ?",
+            (self.FAILED, f"{type(error).__name__}: {error}", self.now(), meeting_id),
+        )
+
+    def unfinished(self) -> list:
+        """
+        :return: the Meeting Jobs which were queued or running, but never finished
+        """
+        return self.find(states=[self.QUEUED, self.RUNNING])
+
+    def find(self, states: list = None, error_contains: str = None) -> list:
+        """
+        Finds jobs in the journal. For example, all jobs that failed because of a wrong content type:
+
+            journal.find(states=[JobJournal.FAILED], error_contains="content-type")
+
+        :param states: only return jobs in one of these states
+        :param error_contains: only return jobs whose last error contains this text
+        :return: the found jobs, as Meeting Jobs
+        """
+        query = "SELECT record FROM meeting_job WHERE 1 = 1"
+        parameters = []
+        if states is not None:
+            query += f" AND state IN ({', '.join('?' for _ in states)})"
+            parameters += states
+        if error_contains is not None:
+            query += " AND last_error LIKE ?"
+            parameters.append(f"%{error_contains}%")
+        query += " ORDER BY year, meeting_id"
+
+        with self.lock:
+            rows = self.connection.execute(query, parameters).fetchall()
+
+        return [MeetingJob(json.loads(row["record"])) for row in rows]
+
+    def execute(self, query: str, parameters: tuple) -> None:
+        """
+        Executes a query and commits it right away
+        """
+        with self.lock, self.connection:
+            self.connection.execute(query, parameters)
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+    @staticmethod
+    def now() -> str:
+        return datetime.now().isoformat()
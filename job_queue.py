@@ -1,6 +1,13 @@
+from collections import deque
 from job import Job
+from retry_policy import CircuitBreaker, RetryPolicy, classify
 
+import concurrent.futures
+import heapq
+import itertools
 import logging
+import threading
+import time
 
 logger = logging.getLogger("unsc_db_filler")
 
@@ -8,45 +15,256 @@ logger = logging.getLogger("unsc_db_filler")
 class JobQueue:
     """
     This class represents a FIFO queue which processes jobs.
-    It has a list of jobs it needs to execute,
+    It has a queue of jobs it needs to execute,
     a list of successfully processed jobs,
     a list of failed jobs (after having retried `retries` (by default 20) times).
+
+    Failed jobs are retried following a `RetryPolicy`: how often, and after how long a backoff, depends
+    on the class of error they failed with. A `CircuitBreaker` pauses all jobs for a host which keeps failing.
+
+    The queue is thread-safe: multiple workers can process jobs from it at the same time (see `run`).
+
+    Jobs which are ready to be processed wait in a FIFO deque per host, jobs waiting for a retry in a heap
+    ordered by when they can be retried. So taking a job only looks at the first job of every host
+    (there are only a few), however many jobs are backing off, or waiting for a paused host.
+
+    A queue can be bounded with `maxsize`: enqueueing then waits while the queue is full. Jobs which are
+    queued again for a retry don't wait, so a worker never blocks on its own queue.
+
+    A queue can be `open`ed, when jobs are still being enqueued while its workers are running (for example
+    by the workers of another queue). Its workers then keep waiting for new jobs until it is `close`d.
     """
 
-    def __init__(self, retries: int = 20) -> None:
-        self.jobs: list = []
+    def __init__(
+        self,
+        retries: int = 20,
+        maxsize: int = 0,
+        policy: RetryPolicy = None,
+        breaker: CircuitBreaker = None,
+    ) -> None:
+        # The ready jobs, by host (None for jobs which don't talk to a host)
+        self.ready: dict = {}
+        # The jobs waiting for a retry: (not before, order, job) tuples
+        self.waiting: list = []
+        # The order jobs were queued in, so the oldest ready job is taken first
+        self.order = itertools.count()
+        self.length: int = 0
+        self.maxsize: int = maxsize
+        self.closed: bool = True
         self.processed: list = []
         self.failed: set = set()
         self.retries: int = retries
+        self.policy: RetryPolicy = policy if policy is not None else RetryPolicy(retries)
+        self.breaker: CircuitBreaker = breaker if breaker is not None else CircuitBreaker()
+
+        # Amount of jobs a worker took from the queue, but did not finish yet.
+        # As long as this is not 0, a failing job can still come back to the queue,
+        # so workers should not stop when the queue is (temporarily) empty.
+        self.in_progress: int = 0
+        self.condition: threading.Condition = threading.Condition()
 
     def enqueue(self, job: Job) -> None:
-        self.jobs.append(job)
+        with self.condition:
+            while self.maxsize > 0 and self.length >= self.maxsize:
+                self.condition.wait()
+
+            self.add(job)
+            self.condition.notify_all()
+
+    def add(self, job: Job) -> None:
+        """
+        Adds a job to the ready jobs of its host, or to the waiting jobs if it is waiting for a retry.
+        The caller must hold the condition.
+        """
+        if job.not_before > time.time():
+            heapq.heappush(self.waiting, (job.not_before, next(self.order), job))
+        else:
+            self.ready.setdefault(job.host(), deque()).append((next(self.order), job))
+        self.length += 1
+
+    def open(self) -> None:
+        """
+        Tells the workers more jobs are coming, even when the queue is empty.
+        """
+        with self.condition:
+            self.closed = False
+
+    def close(self) -> None:
+        """
+        Tells the workers no more jobs are coming. They stop once the queue is drained.
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
 
     def dequeue(self, job: Job) -> None:
-        self.jobs.remove(job)
+        with self.condition:
+            for host, jobs in self.ready.items():
+                for entry in jobs:
+                    if entry[1] is job:
+                        jobs.remove(entry)
+                        self.length -= 1
+                        return
+
+            for index, entry in enumerate(self.waiting):
+                if entry[2] is job:
+                    del self.waiting[index]
+                    heapq.heapify(self.waiting)
+                    self.length -= 1
+                    return
+
+            raise ValueError(f"{job} is not in the queue")
 
     def size(self) -> int:
-        return len(self.jobs)
+        with self.condition:
+            return self.length
+
+    def drained(self) -> bool:
+        """
+        :return: True if the queue is closed, empty and no worker is processing a job anymore
+        """
+        with self.condition:
+            return self.closed and self.length == 0 and self.in_progress == 0
+
+    def take(self, block: bool = True) -> Job:
+        """
+        Takes the oldest job from the queue which is ready to be processed: it is not waiting for a retry,
+        and its host is not paused. If there is none, but other workers are still processing jobs
+        (which might need a retry), jobs are waiting for a retry, or the queue is still open, wait for them.
+
+        :param block: whether to wait when no job is ready.
+                      Workers running in an asyncio event loop must not block, see `drained`.
+        :return: the oldest ready job in the queue, or None if there is nothing (left) to process
+        """
+        with self.condition:
+            while True:
+                job = self.take_ready()
+                if job is not None:
+                    self.in_progress += 1
+                    # Wake up whoever is waiting to enqueue in a full queue
+                    self.condition.notify_all()
+                    return job
+
+                if not block or (
+                    self.length == 0 and self.in_progress == 0 and self.closed
+                ):
+                    return None
+
+                self.condition.wait(timeout=self.time_until_ready())
+
+    def take_ready(self) -> Job:
+        """
+        Removes the oldest ready job from the queue. The caller must hold the condition.
+
+        :return: the job, or None if no job is ready
+        """
+        # The jobs whose backoff is over are ready again
+        now = time.time()
+        while len(self.waiting) > 0 and self.waiting[0][0] <= now:
+            not_before, order, job = heapq.heappop(self.waiting)
+            self.ready.setdefault(job.host(), deque()).append((order, job))
+
+        # The oldest of the first jobs of the hosts which are not paused
+        oldest = None
+        for host, jobs in self.ready.items():
+            if len(jobs) > 0 and self.breaker.allows(host):
+                if oldest is None or jobs[0][0] < oldest[1][0][0]:
+                    oldest = (host, jobs)
+
+        if oldest is None:
+            return None
 
-    def process(self, function) -> None:
+        host, jobs = oldest
+        order, job = jobs.popleft()
+        self.length -= 1
+        # Processing the job can change its host, remember the one it talks to now
+        job.taken_host = host
+        return job
+
+    def time_until_ready(self) -> float:
+        """
+        The caller must hold the condition.
+
+        :return: the amount of seconds until the next waiting job is ready, or None if no job is waiting
+        """
+        if self.length == 0:
+            return None
+
+        ready_at = [
+            self.breaker.reopens_at(host) for host, jobs in self.ready.items() if len(jobs) > 0
+        ]
+        if len(self.waiting) > 0:
+            ready_at.append(self.waiting[0][0])
+
+        return max(0.01, min(ready_at) - time.time())
+
+    def finish(self, job: Job, succeeded: bool, error: Exception = None) -> bool:
+        """
+        Marks a job taken from the queue as finished. A failed job is added back to the queue
+        if it didn't run out of attempts for the class of error it failed with yet.
+        It is only taken from the queue again after a backoff.
+
+        :param job: the job that was processed
+        :param succeeded: whether processing the job went well
+        :param error: the error the job failed with, if it failed
+        :return: True if the failed job was queued again for a retry, False otherwise
         """
-        Try to process the jobs list using the passed function.
+        retried = False
+        job.error_class = classify(error) if not succeeded else None
+        self.breaker.record(job.taken_host, job.error_class)
+
+        with self.condition:
+            self.in_progress -= 1
+            if succeeded:
+                self.processed.append(job)
+            else:
+                # Increment failed attempts of job
+                job.attempts += 1
+                # Add the failed job again to the queue if it didn't fail the max retries times yet
+                if self.policy.should_retry(job.attempts, job.error_class):
+                    job.not_before = time.time() + self.policy.delay(
+                        job.attempts, job.error_class
+                    )
+                    self.add(job)
+                    retried = True
+                else:
+                    # If we failed more than the max retry times, list it as a failed job.
+                    self.failed.add(job)
+
+            # Wake up the workers waiting for either a retry, or for the queue to drain.
+            self.condition.notify_all()
+
+        return retried
+
+    def process(self, function) -> dict:
+        """
+        Try to process the jobs queue using the passed function.
         Whenever the function completes without throwing an error,
         we assume it was successful. If we have an error running the function,
         we will retry the job, and add it back to the queue.
 
-        If the function failed 20 times, we give up and add the job to failed jobs list.
+        If the function failed too many times (see `RetryPolicy`), we give up and add the job to failed jobs list.
+
+        This method can be called from multiple threads at the same time.
+        It returns when the queue is empty and no other worker is still processing a job.
 
         :param function: the function we want to run on the job
+        :return: the statistics of this worker: the amount of completed, retried and failed jobs
         """
+        stats = {
+            "worker": threading.current_thread().name,
+            "completed": 0,
+            "retried": 0,
+            "failed": 0,
+        }
+
         while True:
-            if len(self.jobs) == 0:
+            job = self.take()
+            if job is None:
                 break
 
             logger.info("=====================================")
             try:
-                # Take the oldest job from the queue
-                job = self.jobs.pop(0)
                 logger.info("Trying time %s for job %s", job.attempts, job)
                 function(job)
                 job.complete = True
@@ -57,11 +275,38 @@ class JobQueue:
                     e,
                 )
 
-                # Increment failed attempts of job
-                job.attempts += 1
-                # Add the failed job again to the queue if it didn't fail the max retries times yet
-                if job.attempts <= self.retries:
-                    self.jobs.append(job)
+                if self.finish(job, succeeded=False, error=e):
+                    stats["retried"] += 1
                 else:
-                    # If we failed more than the max retry times, remove it from the queue, and list it as a failed job.
-                    self.failed.add(job)
+                    stats["failed"] += 1
+            else:
+                self.finish(job, succeeded=True)
+                stats["completed"] += 1
+
+        return stats
+
+    def run(self, function, workers: int = 1, name: str = "worker") -> list:
+        """
+        Processes the jobs queue with `workers` threads in parallel, see `process`.
+
+        :param function: the function we want to run on the job
+        :param workers: the amount of threads processing jobs
+        :param name: the name of the threads (used in the logging)
+        :return: a list with the statistics of each worker
+        """
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix=name
+        ) as executor:
+            futures = [executor.submit(self.process, function) for _ in range(workers)]
+            stats = [future.result() for future in futures]
+
+        for worker_stats in stats:
+            logger.info(
+                "Worker %s: %s jobs completed, %s retried, %s failed",
+                worker_stats["worker"],
+                worker_stats["completed"],
+                worker_stats["retried"],
+                worker_stats["failed"],
+            )
+
+        return stats
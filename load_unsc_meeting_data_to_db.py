@@ -1,34 +1,45 @@
 from datetime import datetime
 from dotenv import load_dotenv
-from sqlalchemy.exc import IntegrityError
+from functools import partial
 
 import argparse
-import concurrent.futures
-import fitz
 import logging
-import openpyxl
 import os
-import pickle
-import re
 import threading
 
 from html_downloader import HTMLDownloader
 from meeting_html_parser import MeetingHTMLParser
+from outcome_tokenizer import Outcome
+from record_cache import RecordCache
 from job_queue import JobQueue
+from job_journal import JobJournal
 from job import Job
 from meeting_job import MeetingJob
+from meeting_build_job import MeetingBuildJob
+from document_job import DocumentJob
+from pipeline import Pipeline, Stage
 from pdf_downloader import PDFDownloader
+from pdf_cache import PDFCache
+from rate_limiter import RateLimiter
+from pdf_text_extractor import PDFTextExtractor
 from veto_html_parser import VetoHTMLParser
+from veto_index import VetoIndex
 from vetocasts import VetoCasts
 from meeting import Meeting
 from resolution import Resolution
-from state import State
+from resolution_index import ResolutionIndex
+from retry_policy import CircuitBreaker, PERMANENT
+from ingested_records import IngestedRecords
+from state_registry import StateRegistry
+from text_codec import TextCodec, MODES, PLAIN
 from dbconnection import DBConnection
+from migrations import Migrations
+from bulk_writer import BulkWriter
 
 logger = logging.getLogger("unsc_db_filler")
 sql_logger = logging.getLogger("sqlalchemy")
 logger.setLevel(logging.DEBUG)
-sql_logger.setLevel(logging.INFO)
+sql_logger.setLevel(logging.WARNING)
 
 ch = logging.StreamHandler()
 ch.setLevel(logging.INFO)
@@ -55,40 +66,36 @@ DB_NAME = os.getenv("POSTGRES_DB")
 SCRATCH_FOLDER = "UNDataScraping/scratch"
 RESOLUTION_DOWNLOAD_FOLDER = f"{SCRATCH_FOLDER}/unsc_resolution_pdfs/"
 MEETING_DOWNLOAD_FOLDER = f"{SCRATCH_FOLDER}/unsc_meeting_pdfs/"
+PDF_MANIFEST_FILE = f"{SCRATCH_FOLDER}/pdf_manifest.jsonl"
+TEXT_CACHE_FOLDER = f"{SCRATCH_FOLDER}/pdf_text_cache"
+JOB_JOURNAL_FILE = f"{SCRATCH_FOLDER}/job_journal.sqlite"
+RECORD_CACHE_FILE = f"{SCRATCH_FOLDER}/scact_records_cache.json.gz"
 UN_LIBRARY_FILE1 = "UNExports/089_B02_-_SECURITY_COUNCIL_-_1st_Link.xlsx"
-# A global variable to store the VETO Table in
-VETO_TABLE = None
-
-# DB Connection
-db_connection = DBConnection(
-    host=DB_HOSTNAME, dbname=DB_NAME, user=DB_USERNAME, password=DB_PASSWORD
-)
+# A global variable to store the adopted to draft resolution index in
+RESOLUTION_INDEX = None
+
+# DB Connection, set up in main() once we know how many workers will use it
+db_connection = None
+# Batches the finished meetings and resolutions, to write them to the DB in bulk
+bulk_writer = None
+# Maps the names of the P5 member states to their id in the DB
+STATE_REGISTRY = None
+# Keeps track of the PDFs we downloaded before, and whether to download them again anyway
+PDF_CACHE = None
+REFRESH_PDFS = False
+# The process pool extracting the text of the PDFs
+TEXT_EXTRACTOR = None
+# Records the state of every meeting job on disk, so we can resume after a crash
+JOB_JOURNAL = None
 
 
 class DownloadFailed(Exception):
     pass
 
 
-def initialize_state_table():
-    """
-    This function is used to intialize the state table in the DB.
-    The state table stores the permanent UNSC members. If ever additional P5 members are added,
-    this function needs to be updated.
-
-    :return:
-    """
-    session = db_connection.get_session()
-
-    p5_member_states = ["USA", "UK", "France", "China", "Russia"]
-
-    for state in p5_member_states:
-        session.add(State(name=state))
-
-    try:
-        session.commit()
-    except IntegrityError:
-        logger.info("Record already exists")
-        session.rollback()
+class DraftResolutionNotFound(Exception):
+    # The Excel sheet won't list the draft resolution when we retry, see `retry_policy.classify`
+    error_class = PERMANENT
 
 
 def read_from_scratch(filename: str) -> str:
@@ -111,173 +118,68 @@ def read_from_scratch(filename: str) -> str:
 def read_pdf(pdf: str) -> str:
     """
     Reads the text of a given pdf file, and returns it as unicode UTF-8 encoded
-    text
+    text. The text is extracted in the TEXT_EXTRACTOR its process pool,
+    unless it was extracted before and found in its text cache.
+
     :param pdf: The Path to the PDF
     :return:    The text found inside the PDF UTF-8 encoded
     """
-    with fitz.open(f"{pdf}") as doc:
-        text = ""
-        for page in doc:
-            text += page.get_text()
-
-    return text
+    return TEXT_EXTRACTOR.extract(pdf, sha256=PDF_CACHE.get_sha256(pdf))
 
 
-def find_not_adopted_draft_resolution_mentioned_in(target: str) -> list:
-    """
-    Checks if a string has draft resolutions mentioned.
-    A draft resolution has the format `S/YYYY/X` - `S/YYYY/XXXX`
-    where YYYY is the year and X is the Xth draft resolution of that year.
-    In the earlier days of the UNSC, draft resolutions had the format `S/X - S/XXXXX`
-    If it finds any, it returns them as a list.
-
-    :param target: The string we're searching in
-    :return: a list of found draft resolutions
-    """
-    return re.findall(
-        "(S/[0-9]{1,5}|S/PV.[0-9]{1,4}|S/[0-9]{4}/[0-9]{1,4})\s*\n*\t*\r*not adopted", target
-    )
-
-
-def find_vetoed_draft_resolution_mentioned_in(target: str) -> list:
-    """
-    Checks if a string has vetoed draft resolutions mentioned.
-    A vetoed draft resolution has the format `S/YYYY/X vetoed by` - `S/YYYY/XXXX vetoed by`
-    where YYYY is the year and X is the Xth draft resolution of that year.
-    In the earlier days of the UNSC, draft resolutions had the format `S/X - S/XXXXX`
-    In the first 2 years of the UNSC, draft resolutions also show up as `S/PV.X`
-    In 1986 we also see draft resolutions of the form `S/XXXX/Rev.Y`
-
-    If it finds any, it returns them as a list.
-
-    :param target: The string we're searching in
-    :return: a list of found vetoed draft resolutions
+def find_draft_resolution_for_adopted_resolution(resolution: str) -> str:
     """
-    return re.findall(
-        #"\(?(S/[0-9]{1,5}/Rev.[0-9]+|S/PV.[0-9]{1,4}|S/[0-9]{1,5}|S/[0-9]{4}/[0-9]{1,4})\)?\s*\n*\t*\r*vetoed by",
-        #"\(?(S/[0-9]{1,5}/Rev.[0-9]+|S/PV.[0-9]{1,4}|S/[0-9]{1,5}|S/[0-9]{4}/[0-9]{1,4})\)?\s*\n*\t*\r*\(?[a-zA-Z]*\)*\s*\n*\t*\r*vetoed by",
-        "\(?(S/[0-9]{1,5}/Rev.[0-9]+|S/PV.[0-9]{1,4}|S/[0-9]{1,5}|S/[0-9]{4}/[0-9]{1,4})\)?\s*\n*\t*\r*\(?[a-zA-Z\s]*\)*\s*\n*\t*\r*vetoed by",
-        target,
-    )
+    Given an accepted resolution `S/RES/XXXXX`, what is the original draft resolution?
+    Note, this requires a data export from the UN Library. See README.md, you need `file1.xlsx`
 
+    The lookup is done in the RESOLUTION_INDEX, which is built once from the Excel sheet in `main()`.
 
-def find_vetoed_draft_resolution_mentioned_in_by_partial_match(vetoed_res: str) -> str:
+    :param resolution: the final accepted resolution ID
+    :return: the original draft resolution ID
     """
-    Checks the VETO_TABLE for a partial match..if we find one, return that match
-    Normally not required to be called. Only when the normal flow did not find the resolution
-    in the VETO_TABLE, yet still we believe it's there.
+    logger.info("Finding draft for adopted resolution '%s'", resolution)
+    return RESOLUTION_INDEX.find_draft(resolution)
 
-    For example:
-    S/PV.2686 discussed draft resolution S/18087 according to https://www.un.org/depts/dhl/resguide/scact1986_table_en.html
-    However, the veto table mentions S/18087.Rev1. S/18087 won't be found using an exact match.
-    If we do a partial search, we can find it.
 
-    :param vetoed_res: The vetoed resolution we're searching the vetoed_by person for
-    :return: the draft resolution as listed in the VETO_TABLE
+def find_draft_resolutions_mentioned_in(outcome: str, veto_index: VetoIndex) -> list:
     """
-    for key, value in VETO_TABLE.items():
-        if re.match(vetoed_res, key):
-            return key
+    Finds the ids of all draft resolutions the outcome of a meeting refers to, the way `discover_meeting` does:
+    vetoed and not adopted draft resolutions are mentioned directly, for adopted resolutions
+    we look up their draft resolution.
 
-    # We shouldn't get here... if we would, it means there's some serious discrepancy between
-    # what's on the UNSC Meeting pages and on the veto table.
-    return ""
-
-
-def find_adopted_resolution_mentioned_in(target: str) -> list:
+    :param outcome: the outcome of a meeting
+    :param veto_index: the index of the veto table
+    :return: a list of draft resolution ids
     """
-    Checks if a string has adopted resolutions mentioned.
-    Format of an approved Resolution is: `S/RES/X` - `S/RE/XXXX (YYYY)` where X is the number
-    and YYYY is the year
+    draft_ids = []
+    outcome = Outcome(outcome)
 
-    If it finds any, it returns them as a list.
+    for vetoed_res in outcome.vetoed_drafts:
+        veto = veto_index.find(vetoed_res)
+        if veto is not None:
+            draft_ids.append(veto.draft_id)
 
-    :param target: The string we're searching in
-    :return: a list of found adopted resolutions
-    """
+    draft_ids += outcome.not_adopted_drafts
 
-    # Some resolutions have a space in their name.
-    # Which is not how they are referenced in URLs and other data sources.
-    # Because of that, we remove those spaces first... .
-    target = re.sub("\s+", "", target)
-    return re.findall("S\/RES\/[0-9]{1,4}\s?\(?[0-9]{4}\)?", target)
+    for adopted_res in outcome.adopted_resolutions:
+        draft_ids.append(RESOLUTION_INDEX.find_draft(adopted_res))
 
+    return draft_ids
 
-def find_draft_resolution_for_adopted_resolution(resolution: str) -> str:
-    """
-    Given an accepted resolution `S/RES/XXXXX`, what is the original draft resolution?
-    Note, this requires a data export from the UN Library. See README.md, you need `file1.xlsx`
 
-    :param resolution: the final accepted resolution ID
-    :return: the original draft resolution ID
-    """
-    logger.info("Finding draft for adopted resolution '%s'", resolution)
-    book = openpyxl.load_workbook(UN_LIBRARY_FILE1)
-    sheet = book["results"]
-    for row in range(1, sheet.max_row + 1):
-
-        # At the moment the adopted resolution is at column J,
-        # and the original one at column B.
-        # However..you never know what they might change later again,
-        # so let's just search across 26 columns at least... .
-        for column in "ABCDEFGHIJKLMNOPQRSTUVWXYZ":
-            cell = f"{column}{row}"
-            if sheet[cell].value == resolution:
-                # We found the cell of the adopted resolution..
-                # On the same row, but in column B, we have the
-                # original resolution
-                orig_cell = f"B{row}"
-                return sheet[orig_cell].value
-
-    # If we got here, it means the adopted resolution wasn't found,
-    # or the draft resolution is missing. More than usual, the adopted resolution
-    # wasn't found through exact matching. We've seen data inconsistencies there.
-    # Example S/RES/2498(2019) shows in the Excel sheet as S/RES/2498(2018).
-    # The year is wrong! Let's try to get rid of that suffix (2018) and do some partial matching...
-    # TODO: Fix duplication
-    resolution = re.sub("\(.*\)", "", resolution)
-    logger.info("Searching for '%s(' in the Excel sheet (partial matching)...", resolution)
-    for row in range(1, sheet.max_row + 1):
-
-        # At the moment the adopted resolution is at column J,
-        # and the original one at column B.
-        # However..you never know what they might change later again,
-        # so let's just search across 26 columns at least... .
-        for column in "ABCDEFGHIJKLMNOPQRSTUVWXYZ":
-            cell = f"{column}{row}"
-            if re.match(f"^{resolution}\(", str(sheet[cell].value)):
-                # We found the cell of the adopted resolution..
-                # On the same row, but in column B, we have the
-                # original resolution
-                orig_cell = f"B{row}"
-                return sheet[orig_cell].value
-
-    # If we got here, something is wrong with our original data...
-    # We failed to retrieve the original resolution..
-    return "UNKNOWN"
-
-
-def process_job(job: MeetingJob) -> None:
+def discover_meeting(job: MeetingJob, veto_index: VetoIndex) -> list:
     """
-    This function is the heavy lifter of the data set building
-    It is used as the process method on the Job Queue where all the Meeting Jobs are queued.
+    The first stage of building the dataset. It is used as the process method of the Job Queue
+    where all the Meeting Jobs are queued.
 
-    This function creates the real objects (Meeting, Resolution, ...) that will be persisted to the database.
+    This function creates the real objects (Meeting, Resolution, ...) that will be persisted to the database,
+    and figures out which documents (meeting transcript, draft and adopted resolutions) need to be downloaded
+    to add their text to them.
 
-
-    :param job:
-    :return:
+    :param job: the Meeting Job to discover the documents of
+    :param veto_index: the index of the veto table, to find who vetoed the vetoed draft resolutions
+    :return: the Document Jobs for the download stage
     """
-
-    from time import sleep
-    from math import floor
-    from random import random
-
-    sleep(floor(random() * 10))
-
-    db_session = db_connection.get_session()
-    db_session.autoflush = False
-
     logger.info("Running in thread #%s'", threading.current_thread().name)
 
     meeting_record = job.meeting_record.get("meeting_record")
@@ -288,176 +190,235 @@ def process_job(job: MeetingJob) -> None:
     topic = job.meeting_record.get("topic")
     meeting_url = job.meeting_record.get("meeting_url")
 
-    try:
-        meeting = Meeting(
-            meeting_id=meeting_record,
+    meeting = Meeting(
+        meeting_id=meeting_record,
+        year=year,
+        date=date,
+        topic=topic,
+        meeting_url=meeting_url,
+    )
+    build_job = MeetingBuildJob(job, meeting)
+
+    meeting_pdf_downloader = PDFDownloader(
+        path=f"{MEETING_DOWNLOAD_FOLDER}{year}", cache=PDF_CACHE, refresh=REFRESH_PDFS
+    )
+
+    resolution_pdf_downloader = PDFDownloader(
+        path=f"{RESOLUTION_DOWNLOAD_FOLDER}{year}", cache=PDF_CACHE, refresh=REFRESH_PDFS
+    )
+
+    build_job.add_document(
+        DocumentJob(
+            build_job,
+            document_id=meeting_record,
+            downloader=meeting_pdf_downloader,
+            add_text=meeting.add_meeting_transcript,
+            uri=meeting_url,
+        )
+    )
+
+    # All resolutions mentioned in the outcome, found in a single pass
+    tokens = Outcome(outcome)
+    vetoed_draft_resolutions = tokens.vetoed_drafts
+    not_adopted_resolutions = tokens.not_adopted_drafts
+    adopted_resolutions = tokens.adopted_resolutions
+
+    # Iterate first over the vetoed Resolutions
+    for vetoed_res in vetoed_draft_resolutions:
+
+        # Data inconsistency...
+        # S/PV.2686 discussed draft resolution S/18087 according to https://www.un.org/depts/dhl/resguide/scact1986_table_en.html
+        # However, the veto table mentions S/18087/Rev.1. The veto index finds those as well.
+        veto = veto_index.find(vetoed_res)
+
+        # Because of data inconsistency issues (we have seen that a resolution can be listed as vetoed on the
+        # meeting overview by year webpages, but not on the veto table. If that's the case,
+        # let's not crash but continue... .
+        if veto is None:
+            logger.warning(
+                "Vetoed draft resolution '%s' (%s) is not in the veto table", vetoed_res, meeting_record
+            )
+            continue
+
+        vetoed_res = veto.draft_id
+        veto_voters = veto.vetoed_by
+
+        res = Resolution(
+            draft_id=vetoed_res,
+            final_id=None,
+            kind=Resolution.DRAFT,
+            adopted=False,
+            vetoed=True,
+            # vetoed_by=veto_voters,
+            meeting=meeting,
             year=year,
-            date=date,
-            topic=topic,
-            meeting_url=meeting_url,
         )
 
-        meeting_pdf_downloader = PDFDownloader(path=f"{MEETING_DOWNLOAD_FOLDER}{year}")
+        build_job.add_document(
+            DocumentJob(
+                build_job,
+                document_id=vetoed_res,
+                downloader=resolution_pdf_downloader,
+                add_text=res.add_draft_text,
+            )
+        )
 
-        resolution_pdf_downloader = PDFDownloader(
-            path=f"{RESOLUTION_DOWNLOAD_FOLDER}{year}"
+        build_job.resolutions.append(res)
+
+        for veto_voter in veto_voters:
+            state_id = STATE_REGISTRY.get_state_id(veto_voter)
+            logger.info("Veto voter: %s", veto_voter)
+            logger.info("Veto voter id: %s", state_id)
+            build_job.veto_casts.append(VetoCasts(vetoed_res, state_id))
+
+    # Iterate over the not adopted Resolutions
+    for not_adopted_res in not_adopted_resolutions:
+        res = Resolution(
+            draft_id=not_adopted_res,
+            final_id=None,
+            kind=Resolution.DRAFT,
+            adopted=False,
+            vetoed=False,
+            # vetoed_by=None,
+            meeting=meeting,
+            year=year,
         )
 
-        logger.info("Downloading PDF for meeting '%s' - BEGIN", meeting_record)
-        meeting_pdf = meeting_pdf_downloader.download_pdf(meeting_record, meeting_url)
-        logger.info("Downloading PDF for meeting '%s' - END", meeting_record)
+        build_job.add_document(
+            DocumentJob(
+                build_job,
+                document_id=not_adopted_res,
+                downloader=resolution_pdf_downloader,
+                add_text=res.add_draft_text,
+            )
+        )
 
-        logger.info("Extracting text from PDF for meeting '%s' - BEGIN", meeting_record)
-        meeting_transcript = read_pdf(meeting_pdf)
-        logger.info("Adding text to meeting '%s' - END", meeting_record)
-        meeting.add_meeting_transcript(meeting_transcript)
+        build_job.resolutions.append(res)
 
-        vetoed_draft_resolutions = find_vetoed_draft_resolution_mentioned_in(outcome)
-        not_adopted_resolutions = find_not_adopted_draft_resolution_mentioned_in(
-            outcome
+    # Iterate over the adopted Resolutions
+    for adopted_res in adopted_resolutions:
+        logger.info(
+            f"Searching for draft resolution of resolution '%s' in UN Library Excel sheet",
+            adopted_res,
         )
-        adopted_resolutions = find_adopted_resolution_mentioned_in(outcome)
-
-        # Iterate first over the vetoed Resolutions
-        for vetoed_res in vetoed_draft_resolutions:
-
-            # Data inconsistency...
-            # S/PV.2686 discussed draft resolution S/18087 according to https://www.un.org/depts/dhl/resguide/scact1986_table_en.html
-            # However, the veto table mentions S/18087.Rev1.
-            # So we'll do a partial match... .
-            if VETO_TABLE.get(vetoed_res) is None:
-                vetoed_res = find_vetoed_draft_resolution_mentioned_in_by_partial_match(
-                    vetoed_res
-                )
-
-            # Because of data inconsistency issues (we have seen that a resolution can be listed as vetoed on the
-            # meeting overview by year webpages, but not on the veto table. If that's the case,
-            # let's not crash but continue... .
-            if vetoed_res is None:
-                continue
-
-            veto_voters = VETO_TABLE[vetoed_res]
-
-            res = Resolution(
-                draft_id=vetoed_res,
-                final_id=None,
-                kind=Resolution.DRAFT,
-                adopted=False,
-                vetoed=True,
-                # vetoed_by=veto_voters,
-                meeting=meeting,
-                year=year,
+        draft_res = find_draft_resolution_for_adopted_resolution(adopted_res)
+        if draft_res == "UNKNOWN":
+            raise DraftResolutionNotFound(
+                f"Failed to find the draft resolution for resolution '{adopted_res}' ({meeting_record}) in the Excel sheet"
             )
 
-            logger.info("Downloading PDF for Resolution '%s' - BEGIN", vetoed_res)
-            resolution_pdf = resolution_pdf_downloader.download_pdf(vetoed_res)
-            logger.info("Downloading PDF for Resolution '%s' - END", vetoed_res)
-
-            logger.info("Reading text from PDF '%s' - BEGIN", resolution_pdf)
-            draft_text = read_pdf(resolution_pdf)
-            logger.info("Reading text from PDF '%s' - END", resolution_pdf)
-            res.add_draft_text(draft_text)
-
-            db_session.merge(res)
-
-            for veto_voter in veto_voters:
-                vetoing_state = (
-                    db_session.query(State).filter(State.name == veto_voter).first()
-                )
-                logger.info("Veto voter: %s", veto_voter)
-                logger.info("Veto voter id: %s", vetoing_state.state_id)
-                db_session.add(VetoCasts(vetoed_res, vetoing_state.state_id))
-
-            db_session.commit()
-
-        # Iterate over the not adopted Resolutions
-        for not_adopted_res in not_adopted_resolutions:
-            res = Resolution(
-                draft_id=not_adopted_res,
-                final_id=None,
-                kind=Resolution.DRAFT,
-                adopted=False,
-                vetoed=False,
-                # vetoed_by=None,
-                meeting=meeting,
-                year=year,
+            # We assume that if it is not listed in the Excel sheet,
+            # it is a very old resolution where there were not at all times
+            # draft resolutions for every discussion.
+            #draft_res = adopted_res
+        logger.info(
+            f"Draft resolution of resolution '%s' found in UN Library Excel sheet: %s",
+            adopted_res,
+            draft_res,
+        )
+
+        res = Resolution(
+            draft_id=draft_res,
+            final_id=adopted_res,
+            kind=Resolution.FINAL,
+            adopted=True,
+            vetoed=False,
+            # vetoed_by=None,
+            meeting=meeting,
+            year=year,
+        )
+
+        build_job.add_document(
+            DocumentJob(
+                build_job,
+                document_id=draft_res,
+                downloader=resolution_pdf_downloader,
+                add_text=res.add_draft_text,
             )
+        )
+        build_job.add_document(
+            DocumentJob(
+                build_job,
+                document_id=adopted_res,
+                downloader=resolution_pdf_downloader,
+                add_text=res.add_final_text,
+            )
+        )
 
-            logger.info("Downloading PDF for Resolution '%s' - BEGIN", not_adopted_res)
+        build_job.resolutions.append(res)
 
-            resolution_pdf = resolution_pdf_downloader.download_pdf(not_adopted_res)
-            logger.info("Downloading PDF for Resolution '%s' - END", not_adopted_res)
+    # Only meetings in which resolutions were discussed are part of the dataset.
+    # No need to download anything for the others.
+    if len(build_job.resolutions) == 0:
+        # Nothing to write to the DB for this meeting
+        JOB_JOURNAL.done([meeting_record])
+        return []
 
-            logger.info("Reading text from PDF '%s' - BEGIN", resolution_pdf)
-            draft_text = read_pdf(resolution_pdf)
-            logger.info("Reading text from PDF '%s' - END", resolution_pdf)
-            res.add_draft_text(draft_text)
+    return build_job.documents
 
-            db_session.merge(res)
-            db_session.commit()
 
-        # Iterate over the adopted Resolutions
-        for adopted_res in adopted_resolutions:
-            logger.info(
-                f"Searching for draft resolution of resolution '%s' in UN Library Excel sheet",
-                adopted_res,
-            )
-            draft_res = find_draft_resolution_for_adopted_resolution(adopted_res)
-            if draft_res == "UNKNOWN":
-                raise Exception(
-                    f"Failed to find the draft resolution for resolution '{adopted_res}' ({meeting_record}) in the Excel sheet"
-                )
-
-                # We assume that if it is not listed in the Excel sheet,
-                # it is a very old resolution where there were not at all times
-                # draft resolutions for every discussion.
-                #draft_res = adopted_res
-            logger.info(
-                f"Draft resolution of resolution '%s' found in UN Library Excel sheet: %s",
-                adopted_res,
-                draft_res,
-            )
+def download_document(job: DocumentJob) -> list:
+    """
+    The download stage of building the dataset: downloads the PDF of a document.
 
-            res = Resolution(
-                draft_id=draft_res,
-                final_id=adopted_res,
-                kind=Resolution.FINAL,
-                adopted=True,
-                vetoed=False,
-                # vetoed_by=None,
-                meeting=meeting,
-                year=year,
-            )
+    :param job: the Document Job to download the PDF for
+    :return: the same Document Job, for the extract stage
+    """
+    logger.info("Downloading PDF for '%s' - BEGIN", job.document_id)
+    job.pdf = job.downloader.download_pdf(job.document_id, job.uri)
+    logger.info("Downloading PDF for '%s' - END", job.document_id)
+
+    return [job]
+
+
+def extract_document(job: DocumentJob) -> list:
+    """
+    The extract stage of building the dataset: extracts the text of a downloaded document,
+    and adds it to the meeting or resolution it belongs to.
+
+    :param job: the Document Job to extract the text for
+    :return: the Meeting Build Job the document belongs to for the persist stage, if this was its last document
+    """
+    logger.info("Reading text from PDF '%s' - BEGIN", job.pdf)
+    text = read_pdf(job.pdf)
+    logger.info("Reading text from PDF '%s' - END", job.pdf)
+    job.add_text(text)
+
+    if job.build_job.document_done():
+        return [job.build_job]
+
+    return []
 
-            logger.info("Downloading PDF for Resolution '%s' - BEGIN", draft_res)
 
-            draft_resolution_pdf = resolution_pdf_downloader.download_pdf(draft_res)
-            logger.info("Downloading PDF for Resolution '%s' - END", draft_res)
+def persist_meeting(job: MeetingBuildJob) -> None:
+    """
+    The persist stage of building the dataset: hands a complete meeting over to the bulk writer,
+    which writes it to the database together with other finished meetings.
 
-            logger.info("Downloading PDF for Resolution '%s' - BEGIN", adopted_res)
-            adopted_resolution_pdf = resolution_pdf_downloader.download_pdf(adopted_res)
-            logger.info("Downloading PDF for Resolution '%s' - END", adopted_res)
+    :param job: the Meeting Build Job of the complete meeting
+    """
+    bulk_writer.add(job.meeting, job.resolutions, job.veto_casts)
 
-            logger.info("Reading text from PDF '%s' - BEGIN", draft_resolution_pdf)
-            draft_text = read_pdf(draft_resolution_pdf)
-            logger.info("Reading text from PDF '%s' - END", draft_resolution_pdf)
 
-            logger.info("Reading text from PDF '%s' - BEGIN", adopted_resolution_pdf)
-            adopted_text = read_pdf(adopted_resolution_pdf)
-            logger.info("Reading text from PDF '%s' - END", adopted_resolution_pdf)
+def journaled(function):
+    """
+    Wraps the function of a stage, so every attempt at a job, and every error it gives,
+    is recorded for its meeting in the JOB_JOURNAL.
 
-            res.add_draft_text(draft_text)
-            res.add_final_text(adopted_text)
+    :param function: the function of the stage
+    :return: the wrapped function
+    """
 
-            db_session.merge(res)
-            db_session.commit()
+    def process(job: Job) -> list:
+        meeting_job = job if isinstance(job, MeetingJob) else job.meeting_job
+        JOB_JOURNAL.started(meeting_job)
+        try:
+            return function(job)
+        except Exception as e:
+            JOB_JOURNAL.errored(meeting_job, e)
+            raise
 
-    except IntegrityError as ie:
-        logger.info("Error committing: %s", ie)
-        logger.info("Record already exists in DB...skipping")
-        db_session.rollback()
-    finally:
-        db_session.close()
+    return process
 
 
 def main() -> None:
@@ -481,40 +442,199 @@ def main() -> None:
 
     parser.add_argument(
         "--fetch-all-unsc-tables",
-        help="Forces a re-download of all the UNSC meeting table pages",
+        help="Fetch the UNSC meeting table pages again. Pages which did not change since they were downloaded are kept",
         action="store_true",
         default=False,
     )
 
     parser.add_argument(
-        "--retry-file",
-        help="Retry processing records from a previous run its failed file",
+        "--refresh-tables",
+        help="With --fetch-all-unsc-tables: download all UNSC meeting table pages again, even the ones which did not change",
+        action="store_true",
+        default=False,
+    )
+
+    parser.add_argument(
+        "--extract-processes",
+        help="The amount of processes extracting text from PDFs (defaults to the amount of CPU cores)",
+        action="store",
+        type=int,
+        default=os.cpu_count(),
+    )
+
+    parser.add_argument(
+        "--parse-processes",
+        help="The amount of processes parsing the UNSC meeting table pages (defaults to the amount of CPU cores)",
+        action="store",
+        type=int,
+        default=os.cpu_count(),
+    )
+
+    parser.add_argument(
+        "--table-download-concurrency",
+        help="The amount of UNSC table pages to download at the same time",
+        action="store",
+        type=int,
+        default=8,
+    )
+
+    parser.add_argument(
+        "--force",
+        help="Process all meetings again, even the ones which are in the DB already",
+        action="store_true",
+        default=False,
+    )
+
+    parser.add_argument(
+        "--resume",
+        help="Resume processing the meetings an earlier, crashed or stopped, run did not finish",
+        action="store_true",
+        default=False,
+    )
+
+    parser.add_argument(
+        "--retry-failed",
+        help="Retry processing the meetings which failed in earlier runs",
+        action="store_true",
+        default=False,
+    )
+
+    parser.add_argument(
+        "--failed-with",
+        help="Only retry the failed meetings whose last error contains this text, e.g. 'content-type'",
         action="store",
         type=str,
     )
 
     parser.add_argument(
         "--workers",
-        help="The amount of workers you want to use for parallel processing",
+        help="The amount of workers you want to use for downloading meeting and resolution PDFs in parallel",
         action="store",
         type=int,
         default=8,
     )
 
+    parser.add_argument(
+        "--rate-limit",
+        help="The maximum amount of requests per second to send to a host, e.g. 'undocs.org=2'. Can be given multiple times",
+        action="append",
+        type=str,
+        default=[],
+    )
+
+    parser.add_argument(
+        "--stage-queue-size",
+        help="The maximum amount of jobs waiting between two processing stages",
+        action="store",
+        type=int,
+        default=100,
+    )
+
+    parser.add_argument(
+        "--refresh-pdfs",
+        help="Download all meeting and resolution PDFs again, even the ones downloaded in an earlier run",
+        action="store_true",
+        default=False,
+    )
+
+    parser.add_argument(
+        "--verify-pdf-cache",
+        help="Verify the earlier downloaded PDFs against their hash in the PDF manifest, and exit",
+        action="store_true",
+        default=False,
+    )
+
+    parser.add_argument(
+        "--batch-size",
+        help="The amount of meetings to collect before writing them to the database in one go",
+        action="store",
+        type=int,
+        default=100,
+    )
+
+    parser.add_argument(
+        "--text-storage",
+        help="How to store the meeting transcripts and resolution texts in the database: as plain text, or gzip or zstd compressed",
+        action="store",
+        choices=MODES,
+        default=PLAIN,
+    )
+
+    parser.add_argument(
+        "--echo-sql",
+        help="Log every SQL statement sent to the database",
+        action="store_true",
+        default=False,
+    )
+
     if not os.path.exists(f"{SCRATCH_FOLDER}"):
         os.makedirs(f"{SCRATCH_FOLDER}")
 
     args = parser.parse_args()
 
+    if args.echo_sql:
+        sql_logger.setLevel(logging.INFO)
+
+    # All downloaders share the rate limiter, so the budget per host holds for all of them together
+    for rate_limit in args.rate_limit:
+        host, rate = rate_limit.split("=")
+        RateLimiter.shared().set_rate(host.strip(), float(rate))
+
+    # All meetings and resolutions store their texts the same way
+    TextCodec.use(args.text_storage)
+
+    global PDF_CACHE, REFRESH_PDFS
+    PDF_CACHE = PDFCache(PDF_MANIFEST_FILE)
+    REFRESH_PDFS = args.refresh_pdfs
+
+    if args.verify_pdf_cache:
+        PDF_CACHE.verify()
+        return
+
+    # Only the main thread, the thread filling the queue and the persist stage workers talk to the DB
+    persist_workers = 1
+    global db_connection
+    db_connection = DBConnection(
+        host=DB_HOSTNAME,
+        dbname=DB_NAME,
+        user=DB_USERNAME,
+        password=DB_PASSWORD,
+        pool_size=persist_workers + 2,
+        echo=args.echo_sql,
+    )
+
+    # Create the tables, or bring them up to date
+    Migrations(db_connection.get_engine()).migrate()
+
+    global JOB_JOURNAL
+    JOB_JOURNAL = JobJournal(JOB_JOURNAL_FILE)
+
+    # Meetings are only done once they are written to the DB, and failed if the DB refuses them
+    global bulk_writer
+    bulk_writer = BulkWriter(
+        db_connection.get_engine(),
+        batch_size=args.batch_size,
+        on_flush=JOB_JOURNAL.done,
+        on_failed=JOB_JOURNAL.write_failed,
+    )
+
+    # One circuit breaker for all queues: when a host keeps failing in one stage, the other stages pause it too
+    breaker = CircuitBreaker()
+
     # Prepare our job processing queue
-    job_queue = JobQueue()
+    job_queue = JobQueue(breaker=breaker)
 
     if args.fetch_all_unsc_tables:
         downloader = HTMLDownloader(
-            path=SCRATCH_FOLDER, since=args.since, until=args.until
+            path=SCRATCH_FOLDER,
+            since=args.since,
+            until=args.until,
+            use_async=True,
+            concurrency=args.table_download_concurrency,
+            refresh=args.refresh_tables,
+            breaker=breaker,
         )
-        downloader.fetch_meeting_tables()
-        downloader.fetch_veto_table()
+        downloader.fetch_all_tables()
 
         # The download queue should be empty.. if it's not we miss critical information
         # and should NOT continue.. we'll stop here.
@@ -524,104 +644,189 @@ def main() -> None:
             )
             exit(-1)
 
-    # Prepare the Veto Mapping Dictionary
+    # Prepare the veto index (shared by all workers)
     html = read_from_scratch("scact_veto_table_en.html")
     veto_parser = VetoHTMLParser(html)
-    global VETO_TABLE
-    VETO_TABLE = veto_parser.create_resolution_to_veto_mapping_table()
-
-    initialize_state_table()
-
-    def fill_queue(from_year: int, end_year: int):
-        for year in range(from_year, end_year):
-            try:
-                html = read_from_scratch(f"scact{year}_table_en.html")
+    veto_index = veto_parser.create_veto_index()
 
-                meeting_parser = MeetingHTMLParser(html)
-                records: list = meeting_parser.extract_records()
+    # Prepare the adopted to draft resolution index (shared by all workers)
+    global RESOLUTION_INDEX
+    RESOLUTION_INDEX = ResolutionIndex(UN_LIBRARY_FILE1).load()
 
-                for record in records:
-                    # Add the current year to the record
-                    record["year"] = year
+    global STATE_REGISTRY
+    STATE_REGISTRY = StateRegistry(db_connection.get_engine()).load()
 
-                    # Debug specific meeting record
-                    #if record["meeting_record"].strip() != "S/PV.423":
-                    #    continue
-
-                    # Make jobs from each record, and queue it.
-                    j = MeetingJob(record)
-                    job_queue.enqueue(j)
+    def fill_queue(from_year: int, end_year: int):
+        # Unless forced, skip the meetings which are in the DB with all their resolutions already
+        ingested = (
+            IngestedRecords(db_connection.get_engine()).load(from_year, end_year)
+            if not args.force
+            else None
+        )
+        skipped = 0
 
-            except Exception as e:
-                logger.error("Failed reading html pages: %s", e)
+        # The pages are only parsed again when they, or the parser, changed since the last run
+        record_cache = RecordCache(RECORD_CACHE_FILE)
 
-            try:
-                # Check for covid tables... if there's any, parse them..else, skip
-                covid_table = f"scact{year}_covid_table_en.html"
-                if not os.path.exists(f"{SCRATCH_FOLDER}/{covid_table}"):
-                    continue
-                else:
-                    html = read_from_scratch(covid_table)
-                    meeting_parser = MeetingHTMLParser(html)
-                    records: list = meeting_parser.extract_records()
+        def job_of(record: dict) -> MeetingJob:
+            nonlocal skipped
+            if ingested is not None and ingested.has(
+                record["meeting_record"],
+                find_draft_resolutions_mentioned_in(record.get("outcome", ""), veto_index),
+            ):
+                skipped += 1
+                return None
 
-                    for record in records:
-                        # Add the current year to the record
-                        record["year"] = year
+            # Make a job from each record
+            return MeetingJob(record)
 
-                        # Debug specific meeting record
-                        #if record["meeting_record"].strip() != "S/PV.423":
-                        #    continue
+        # The yearly pages, and the covid pages of the years which have them
+        pages = {}
+        for year in range(from_year, end_year):
+            pages[f"{SCRATCH_FOLDER}/scact{year}_table_en.html"] = year
+
+            covid_table = f"{SCRATCH_FOLDER}/scact{year}_covid_table_en.html"
+            if os.path.exists(covid_table):
+                pages[covid_table] = year
+
+        # The pages are parsed in a process pool, the meetings of a page are queued as soon as it is parsed
+        queued = 0
+        for html_file, records in record_cache.records_of(
+            list(pages.keys()), processes=args.parse_processes
+        ):
+            jobs = []
+            for record in records:
+                # Add the current year to the record
+                record["year"] = pages[html_file]
+
+                # Debug specific meeting record
+                #if record["meeting_record"].strip() != "S/PV.423":
+                #    continue
+
+                job = job_of(record)
+                if job is not None:
+                    jobs.append(job)
+
+            # The jobs of a page are journaled at once, and then queued
+            JOB_JOURNAL.queued(jobs)
+            for job in jobs:
+                job_queue.enqueue(job)
+            queued += len(jobs)
+
+        record_cache.save()
+
+        logger.info("Skipped %s meetings which are in the DB already", skipped)
+        logger.info("%s jobs queued", queued)
+
+    def fill_queue_while_running(from_year: int, end_year: int):
+        # The workers start on the first meetings while the later years are still being parsed,
+        # the queue is closed once all of them are queued
+        try:
+            fill_queue(from_year, end_year)
+        except Exception as e:
+            logger.error("!!! Failed queueing the meetings: %s !!!", e)
+        finally:
+            job_queue.close()
+
+    # Fills the queue in the background, unless we resume or retry
+    filler = None
+
+    # If a user wants to resume an earlier run, enqueue the jobs it did not finish.
+    if args.resume:
+        unfinished_jobs = JOB_JOURNAL.unfinished()
+        logger.info("Resuming %s unfinished jobs", len(unfinished_jobs))
+
+        for job in unfinished_jobs:
+            job_queue.enqueue(job)
+
+    # If a user wants to retry the jobs which failed before, enqueue those (again).
+    elif args.retry_failed:
+        failed_jobs = JOB_JOURNAL.find(
+            states=[JobJournal.FAILED], error_contains=args.failed_with
+        )
+        logger.info("Retrying %s failed jobs", len(failed_jobs))
+        JOB_JOURNAL.queued(failed_jobs)
 
-                        # Make jobs from each record, and queue it.
-                        j = MeetingJob(record)
-                        job_queue.enqueue(j)
+        for job in failed_jobs:
+            logger.info(job.meeting_record)
+            job_queue.enqueue(job)
 
-            except Exception as e:
-                logger.error("Failed reading covid html pages: %s", e)
+    # Else..just enqueue records between the --since and --until years, while the pipeline runs.
+    else:
+        job_queue.open()
+        filler = threading.Thread(
+            target=fill_queue_while_running,
+            args=(args.since, args.until),
+            name="fill_queue",
+        )
+        filler.start()
 
-        logger.info("%s jobs queued, ready for processing", job_queue.size())
+    global TEXT_EXTRACTOR
+    TEXT_EXTRACTOR = PDFTextExtractor(
+        processes=args.extract_processes, cache_folder=TEXT_CACHE_FOLDER
+    )
 
-    # If a user specified a --retry-file,
-    # Unpickle and enqueue the jobs that previously failed and we want to retry now.
-    if args.retry_file:
-        logger.info("Retrying records in file '%s'", args.retry_file)
-        failed_jobs = pickle.load(open(args.retry_file, "rb"))
-        logger.info("%s jobs found in the file", len(failed_jobs))
+    # Every meeting goes through the stages:
+    #  discover: which documents do we need for the meeting (fast, no network)
+    #  download: download the PDFs of the documents (network bound)
+    #  extract: extract the text of the PDFs (CPU bound, in the TEXT_EXTRACTOR its process pool)
+    #  persist: write the complete meetings to the DB, in batches (a single writer)
+    # When a job fails in a stage, only that stage its job is retried.
+    pipeline = Pipeline(
+        [
+            Stage(
+                "discover",
+                journaled(partial(discover_meeting, veto_index=veto_index)),
+                job_queue=job_queue,
+            ),
+            Stage(
+                "download",
+                journaled(download_document),
+                workers=args.workers,
+                maxsize=args.stage_queue_size,
+                breaker=breaker,
+            ),
+            Stage(
+                "extract",
+                journaled(extract_document),
+                workers=args.extract_processes,
+                maxsize=args.stage_queue_size,
+                breaker=breaker,
+            ),
+            Stage(
+                "persist",
+                journaled(persist_meeting),
+                workers=persist_workers,
+                maxsize=args.stage_queue_size,
+                breaker=breaker,
+            ),
+        ]
+    )
+    failed_stage_jobs = pipeline.run()
+    TEXT_EXTRACTOR.shutdown()
+    if filler is not None:
+        filler.join()
 
-        for job in failed_jobs:
-            logger.info(job.meeting_record)
+    # Write the last, partially filled, batch
+    try:
+        bulk_writer.flush()
+    except Exception as e:
+        logger.error("!!! Failed writing the last batch of meetings to the DB: %s !!!", e)
 
-            # Debug specific meeting record
-            # if job.meeting_record.get('meeting_id') != 'S/PV.2970':
-            #    continue
+    # A meeting failed when any of its stage jobs failed
+    failed = {
+        job if isinstance(job, MeetingJob) else job.meeting_job
+        for job in failed_stage_jobs
+    }
 
-            j = MeetingJob(job.meeting_record)
-            job_queue.enqueue(j)
+    logger.info("%s jobs failed to process", len(failed))
+    logger.info("Failed jobs: %s", failed)
 
-    # Else..if we do not specify a retry-file, just enqueue records between the --since and --until years.
-    else:
-        fill_queue(from_year=args.since, end_year=args.until)
-
-    with concurrent.futures.ThreadPoolExecutor(max_workers=args.workers) as executor:
-        executor.submit(job_queue.process, process_job)
-        executor.submit(job_queue.process, process_job)
-        executor.submit(job_queue.process, process_job)
-
-    logger.info("%s jobs remaining unprocessed", job_queue.size())
-    logger.info("%s jobs failed to process", len(job_queue.failed))
-    logger.info("Failed jobs: %s", job_queue.failed)
-
-    # Save the failed jobs to a file for retry later
-    if len(job_queue.failed) > 0:
-        pickle.dump(
-            job_queue.failed,
-            open(f"failed_records-{datetime.now().isoformat()}.p", "wb"),
-        )
+    # Remember the failed jobs in the journal, to retry them later with --retry-failed
+    for job in failed:
+        JOB_JOURNAL.failed(job)
 
-        with open(f"failed_records-{datetime.now().isoformat()}.txt", "a") as f:
-            for record in job_queue.failed:
-                f.write(f"{record.meeting_record}\n")
+    JOB_JOURNAL.close()
 
 
 if __name__ == "__main__":
@@ -2,6 +2,7 @@ from sqlalchemy.orm import relationship
 from sqlalchemy import Column, Integer, String, Boolean, UniqueConstraint
 
 from dbconnection import Base
+from meeting_transcript import MeetingTranscript
 
 # from resolution import Resolution
 
@@ -16,6 +17,9 @@ class Meeting(Base):
     in a meeting, there's one or more draft resolutions being discussed,
     which are related to a specific topic,
     and each meeting has a unique url where you can find the meeting transcript
+
+    The transcript itself is kept in the `meeting_transcript` table. It is only read from the DB
+    when `full_text` is used, so loading meetings stays fast.
     """
 
     __tablename__ = "meeting"
@@ -23,14 +27,15 @@ class Meeting(Base):
 
     meeting_id = Column(String, primary_key=True)
     topic = Column(String)
-    full_text = Column(String)
     url = Column(String)
     date = Column(String)
-    year = Column(Integer)
+    year = Column(Integer, index=True)
     veto_used_in_meeting = Column(Boolean)
 
     # Back Population, defining what is referring back to this table
     resolution = relationship("Resolution", back_populates="meeting")
+    # Loaded on first use only
+    transcript = relationship("MeetingTranscript", uselist=False, lazy="select")
 
     def __init__(
         self,
@@ -45,12 +50,16 @@ class Meeting(Base):
         self.year = year
         self.date = date
         self.topic = topic
-        self.full_text = ""
+        self.transcript = MeetingTranscript(meeting_id)
         self.url = meeting_url
         self.veto_used_in_meeting = veto_used_in_meeting
 
+    @property
+    def full_text(self) -> str:
+        return self.transcript.text if self.transcript is not None else None
+
     def add_meeting_transcript(self, text: str) -> None:
-        self.full_text = text
+        self.transcript.text = text
 
     def __repr__(self) -> str:
-        return f"id: {self.meeting_id} -- year: {self.year} -- topic: {self.topic} -- veto used: {self.veto_used_in_meeting} -- transcript: {'Available' if len(self.full_text) > 0 else 'N/A'}"
+        return f"id: {self.meeting_id} -- year: {self.year} -- topic: {self.topic} -- veto used: {self.veto_used_in_meeting} -- transcript: {'Available' if self.full_text else 'N/A'}"
@@ -0,0 +1,48 @@
+from job import Job
+from meeting import Meeting
+from meeting_job import MeetingJob
+
+import threading
+
+
+class MeetingBuildJob(Job):
+    """
+    A Meeting build job holds a meeting that is being built from a `MeetingJob`:
+    the Meeting, the Resolutions discussed in it, the VetoCasts on them,
+    and the documents (`DocumentJob`s) whose text still needs to be added to them.
+
+    Once the text of all its documents is added, the meeting is complete, and can be persisted.
+    It can be enqueued to a `Queue` instance for retrying when failing.
+
+    """
+
+    def __init__(self, meeting_job: MeetingJob, meeting: Meeting, description: str = "") -> None:
+        super().__init__(description=description)
+        self.meeting_job: MeetingJob = meeting_job
+        self.meeting: Meeting = meeting
+        self.resolutions: list = []
+        self.veto_casts: list = []
+        self.documents: list = []
+
+        self.remaining: int = 0
+        self.lock: threading.Lock = threading.Lock()
+
+    def add_document(self, document) -> None:
+        self.documents.append(document)
+        self.remaining += 1
+
+    def document_done(self) -> bool:
+        """
+        Marks one of the documents of the meeting as done.
+
+        :return: True if this was the last document, and the meeting is complete
+        """
+        with self.lock:
+            self.remaining -= 1
+            return self.remaining == 0
+
+    def info(self):
+        return self.meeting_job.info()
+
+    def __repr__(self) -> str:
+        return f"Job for building meeting {self.meeting_job.info()} -- {self.remaining} documents remaining"
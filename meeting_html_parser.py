@@ -1,13 +1,28 @@
 from bs4 import BeautifulSoup
 import logging
-import re
+
+from outcome_tokenizer import LETTER, RESOLUTION_MENTION, RESOLUTION_OR_MEETING_MENTION
+from veto_html_parser import parse_html
 
 logger = logging.getLogger("unsc_db_filler")
 
 
 class MeetingHTMLParser:
-    def __init__(self, html: str):
+    """
+    Parses a UNSC meeting table page. It can use two backends, which give the same records:
+     - `lxml` (the default): fast, using lxml its HTML parser and XPath
+     - `html5lib`: slow, using BeautifulSoup with html5lib, which parses pages exactly like a browser
+    """
+
+    LXML = "lxml"
+    HTML5LIB = "html5lib"
+
+    # Bump this whenever a change to the parser changes the records it extracts
+    VERSION = "1"
+
+    def __init__(self, html: str, backend: str = LXML):
         self.html = html
+        self.backend = backend
 
     def extract_records(self) -> list:
         """
@@ -40,13 +55,9 @@ class MeetingHTMLParser:
         => prior to 1994, we want all columns. As from 1994, we skip the 3rd column.
         """
 
-        soup = BeautifulSoup(self.html, "html5lib")
-        rows = soup.table.find_all("tr")
-
         records = []
 
-        for row in rows:
-            cells = row.find_all("td")
+        for cells in self.rows():
             if len(cells) == 0:
                 continue
             # If we have 7 columns, we're looking at the table structure of COVID times
@@ -54,38 +65,35 @@ class MeetingHTMLParser:
             # We take the record and document behind "Letter with Vote Procedure / Briefings"
             # as it contains the most complete information wrt the virtual meeting.
             if len(cells) == 7:
-                if re.findall(
-                    "S/[0-9]{1,5}|S/[0-9]{4}\/[0-9]{1,4}|S/RES/[0-9]{1,4}\s?\(?[0-9]{4}\)?",
-                    cells[6].get_text(),
-                ):
+                if RESOLUTION_MENTION.search(self.text(cells[6])):
                     # If there's no meeting record (S/PV.XXXX), the virtual meeting
                     # text is and voting is captured in full in the
                     # "Letter with Vote Procedure / Briefings" document
                     # This is captured in column 6.
-                    meeting_record = cells[0].get_text()
+                    meeting_record = self.text(cells[0])
                     # If the first column has --, there's no S/PV.XXXX record.
                     # We look at the 6th column:
                     if meeting_record == "--":
-                        if cells[5].get_text() != "--":
-                            meeting_record = cells[5].get_text().replace("\n\t\t", "")
+                        if self.text(cells[5]) != "--":
+                            meeting_record = self.text(cells[5]).replace("\n\t\t", "")
                             # If there are multiple records listed, we will only add the first one
                             # Example: 16 April 2021: S/2021/373 and S/2021/372 (on the same topic)
-                            meeting_record = re.match('S\/[0-9]{4}\/[0-9]{0,3}', meeting_record).group(0)
-                            meeting_url = cells[5].a["href"]
+                            meeting_record = LETTER.match(meeting_record).group(0)
+                            meeting_url = self.href(cells[5])
                         else:
                             # If the 6th column also has --, then we skip it, it was a private meeting.
                             # Example 8 June 2020, S/RES/2580 (2021). No data at all available... .
                             continue
                     else:
-                        meeting_url = cells[0].a["href"]
+                        meeting_url = self.href(cells[0])
 
                     records.append(
                         {
                             "meeting_record": meeting_record,
                             "meeting_url": meeting_url,
-                            "date": cells[1].get_text(),
-                            "topic": cells[3].get_text(),
-                            "outcome": cells[6].get_text(),
+                            "date": self.text(cells[1]),
+                            "topic": self.text(cells[3]),
+                            "outcome": self.text(cells[6]),
                         }
                     )
 
@@ -102,38 +110,63 @@ class MeetingHTMLParser:
                 #
                 # Format of an approved Resolution is: `S/RES/X` - `S/RES/XXXX (YYYY)` where X is the number
                 # and YYYY is the year
-                if re.findall(
-                    "S\/[0-9]{1,5}|S\/[0-9]{4}\/[0-9]{1,4}|S\/RES\/[0-9]{1,4}\s?\(?[0-9]{4}\)?",
-                    cells[4].get_text(),
-                ):
+                if RESOLUTION_MENTION.search(self.text(cells[4])):
                     records.append(
                         {
-                            "meeting_record": cells[0].get_text(),
-                            "meeting_url": cells[0].a["href"],
-                            "date": cells[1].get_text(),
-                            "topic": cells[3].get_text(),
-                            "outcome": cells[4].get_text(),
+                            "meeting_record": self.text(cells[0]),
+                            "meeting_url": self.href(cells[0]),
+                            "date": self.text(cells[1]),
+                            "topic": self.text(cells[3]),
+                            "outcome": self.text(cells[4]),
                         }
                     )
             # We're in the pre-1994 table structure.
-            elif len(cells) == 4 and re.findall(
-                "S/PV.[0-9]{1,4}|S/[0-9]{1,5}|S/[0-9]{4}/[0-9]{1,4}|S/RES/[0-9]{1,4}\s?\(?[0-9]{4}\)?",
-                cells[3].get_text(),
+            elif len(cells) == 4 and RESOLUTION_OR_MEETING_MENTION.search(
+                self.text(cells[3])
             ):
                 # Sometimes there's no meeting record (see early years, eg: 1948)
                 # We can't store the data then as we can't relate in which meeting
                 # a resolution was voted... .
-                if cells[0].get_text() == "":
+                if self.text(cells[0]) == "":
                     continue
 
                 records.append(
                     {
-                        "meeting_record": cells[0].get_text(),
-                        "meeting_url": cells[0].a["href"],
-                        "date": cells[1].get_text(),
-                        "topic": cells[2].get_text(),
-                        "outcome": cells[3].get_text(),
+                        "meeting_record": self.text(cells[0]),
+                        "meeting_url": self.href(cells[0]),
+                        "date": self.text(cells[1]),
+                        "topic": self.text(cells[2]),
+                        "outcome": self.text(cells[3]),
                     }
                 )
 
         return records
+
+    def rows(self) -> list:
+        """
+        :return: the cells (<td> elements) of every row of the first table on the page
+        """
+        if self.backend == self.LXML:
+            table = parse_html(self.html).find(".//table")
+            return [row.xpath(".//td") for row in table.iter("tr")]
+
+        soup = BeautifulSoup(self.html, "html5lib")
+        return [row.find_all("td") for row in soup.table.find_all("tr")]
+
+    def text(self, cell) -> str:
+        """
+        :return: all the text in a cell
+        """
+        if self.backend == self.LXML:
+            return cell.text_content()
+
+        return cell.get_text()
+
+    def href(self, cell) -> str:
+        """
+        :return: where the first link in a cell points to
+        """
+        if self.backend == self.LXML:
+            return cell.find(".//a").get("href")
+
+        return cell.a["href"]
@@ -0,0 +1,43 @@
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
+from sqlalchemy import Column, String, LargeBinary, ForeignKey, Index
+
+from dbconnection import Base
+from text_codec import TextCodec
+
+
+class MeetingTranscript(Base):
+    """
+    Holds the transcript of a UN Security Council Meeting.
+
+    Transcripts are large, and most queries only need the ids, years and topics of the meetings.
+    So they are kept in a table of their own, which is only read when the text is needed.
+
+    Depending on the text storage mode (see `TextCodec`), the transcript is stored as plain text (full_text)
+    or compressed (full_text_compressed). Use `text` to read or write it either way.
+
+    full_text_tsv holds the words of the transcript, for full text search (see `TextSearch`).
+    The `BulkWriter` fills it in when writing the transcript.
+    """
+
+    __tablename__ = "meeting_transcript"
+    __table_args__ = (
+        Index("meeting_transcript_full_text_tsv_idx", "full_text_tsv", postgresql_using="gin"),
+    )
+
+    meeting_id = Column(String, ForeignKey("meeting.meeting_id"), primary_key=True)
+    full_text = Column(String)
+    full_text_compressed = Column(LargeBinary)
+    full_text_tsv = deferred(Column(TSVECTOR))
+
+    def __init__(self, meeting_id: str, full_text: str = "") -> None:
+        self.meeting_id = meeting_id
+        self.text = full_text
+
+    @property
+    def text(self) -> str:
+        return TextCodec.decode(self.full_text, self.full_text_compressed)
+
+    @text.setter
+    def text(self, text: str) -> None:
+        self.full_text, self.full_text_compressed = TextCodec.shared().encode(text)
@@ -0,0 +1,363 @@
+"""
+The versioned migrations of the database schema.
+
+Every migration has a version, and the `schema_version` table remembers which ones were applied.
+`Migrations.migrate` applies the ones which were not, in order, each in a transaction of its own.
+So a new database is created from scratch, and a database restored from an earlier export is brought up to date.
+To change the schema: change the models, and add a migration which changes existing databases the same way.
+
+The first migration creates the tables as the models define them now, so on a new database the later migrations
+find their changes made already. That's why all of them check first (IF NOT EXISTS, ...).
+
+To migrate the database, and check the common queries can use the indexes:
+
+    $ python migrations.py
+    $ python migrations.py --check-query-plans
+"""
+from datetime import datetime
+from typing import NamedTuple
+
+from dotenv import load_dotenv
+from sqlalchemy import Column, Integer, MetaData, String, Table, func, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+import argparse
+import json
+import logging
+import os
+
+from dbconnection import Base, DBConnection
+from meeting import Meeting
+from meeting_transcript import MeetingTranscript
+from resolution import Resolution
+from resolution_text import ResolutionText
+from state import State
+from text_codec import TextCodec
+from text_search import CONFIGURATION, MAX_INDEXED_CHARACTERS
+from vetocasts import VetoCasts
+
+logger = logging.getLogger("unsc_db_filler")
+
+# Kept out of the metadata of the models, so it's only ever created here
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("description", String),
+    Column("applied_at", String),
+)
+
+# Any number will do, as long as nothing else uses it: only one process at a time migrates the database
+MIGRATION_LOCK = 4_865_310
+
+# The texts: their table, id column, and the plain, compressed and tsvector column of each of them
+TEXT_COLUMNS = [
+    ("meeting_transcript", "meeting_id", "full_text", "full_text_compressed", "full_text_tsv"),
+    ("resolution_text", "draft_id", "draft_text", "draft_text_compressed", "draft_text_tsv"),
+    ("resolution_text", "draft_id", "final_text", "final_text_compressed", "final_text_tsv"),
+]
+
+
+def create_tables(connection: Connection) -> None:
+    Base.metadata.create_all(
+        connection,
+        tables=[State.__table__, Meeting.__table__, Resolution.__table__, VetoCasts.__table__],
+    )
+
+
+def move_texts_to_own_tables(connection: Connection) -> None:
+    Base.metadata.create_all(
+        connection, tables=[MeetingTranscript.__table__, ResolutionText.__table__]
+    )
+
+    # The exports up to 2022-07-07 have the texts in the meeting and resolution tables
+    inspector = inspect(connection)
+    if "full_text" in {column["name"] for column in inspector.get_columns("meeting")}:
+        moved = connection.execute(
+            text(
+                "INSERT INTO meeting_transcript (meeting_id, full_text) "
+                "SELECT meeting_id, full_text FROM meeting "
+                "ON CONFLICT (meeting_id) DO NOTHING"
+            )
+        ).rowcount
+        connection.execute(text("ALTER TABLE meeting DROP COLUMN full_text"))
+        logger.info("Moved %s meeting transcripts", moved)
+
+    if "draft_text" in {column["name"] for column in inspector.get_columns("resolution")}:
+        moved = connection.execute(
+            text(
+                "INSERT INTO resolution_text (draft_id, draft_text, final_text) "
+                "SELECT draft_id, draft_text, final_text FROM resolution "
+                "WHERE draft_id IS NOT NULL "
+                "ON CONFLICT (draft_id) DO NOTHING"
+            )
+        ).rowcount
+        connection.execute(
+            text("ALTER TABLE resolution DROP COLUMN draft_text, DROP COLUMN final_text")
+        )
+        logger.info("Moved %s resolution texts", moved)
+
+
+def add_compressed_text_columns(connection: Connection) -> None:
+    for table, id_column, plain, compressed, tsv in TEXT_COLUMNS:
+        connection.execute(
+            text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {compressed} BYTEA")
+        )
+
+
+def add_full_text_search(connection: Connection) -> None:
+    for table, id_column, plain, compressed, tsv in TEXT_COLUMNS:
+        connection.execute(
+            text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {tsv} TSVECTOR")
+        )
+        connection.execute(
+            text(f"CREATE INDEX IF NOT EXISTS {table}_{tsv}_idx ON {table} USING gin ({tsv})")
+        )
+
+        # Plain texts are indexed by the server, compressed texts are decompressed here first
+        connection.execute(
+            text(
+                f"UPDATE {table} SET {tsv} = to_tsvector(CAST(:configuration AS regconfig), left({plain}, :length)) "
+                f"WHERE {tsv} IS NULL AND {plain} IS NOT NULL"
+            ),
+            {"configuration": CONFIGURATION, "length": MAX_INDEXED_CHARACTERS},
+        )
+
+        rows = connection.execute(
+            text(
+                f"SELECT {id_column}, {compressed} FROM {table} "
+                f"WHERE {tsv} IS NULL AND {compressed} IS NOT NULL"
+            )
+        ).all()
+        update = text(
+            f"UPDATE {table} SET {tsv} = to_tsvector(CAST(:configuration AS regconfig), CAST(:text AS text)) "
+            f"WHERE {id_column} = :id"
+        )
+        for id, data in rows:
+            connection.execute(
+                update,
+                {
+                    "configuration": CONFIGURATION,
+                    "text": TextCodec.decompress(data)[:MAX_INDEXED_CHARACTERS],
+                    "id": id,
+                },
+            )
+
+
+def add_indexes(connection: Connection) -> None:
+    # The indexes of the common joins and filters, as defined in the models (index=True)
+    for model in [Meeting, Resolution, VetoCasts]:
+        for index in model.__table__.indexes:
+            index.create(connection, checkfirst=True)
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    # Applies the migration, within the transaction it gets the connection of
+    apply: object
+
+
+MIGRATIONS = [
+    Migration(
+        1,
+        "Create the meeting, resolution, state and vetocasts tables",
+        create_tables,
+    ),
+    Migration(
+        2,
+        "Move the texts to the meeting_transcript and resolution_text tables",
+        move_texts_to_own_tables,
+    ),
+    Migration(
+        3,
+        "Add the columns of the compressed text storage mode",
+        add_compressed_text_columns,
+    ),
+    Migration(
+        4,
+        "Add full text search columns and indexes to the texts",
+        add_full_text_search,
+    ),
+    Migration(
+        5,
+        "Add indexes for the common joins and filters",
+        add_indexes,
+    ),
+]
+
+# The queries the EDA notebook and the TextSearch are built on, and the indexes they should be able to use.
+# The joins read whole tables, where a hash join is the best plan, so only their plans are shown.
+NOTEBOOK_JOINS = {
+    "resolutions with their meetings": (
+        "SELECT * FROM resolution r JOIN meeting m ON m.meeting_id = r.meeting_id AND m.year = r.year"
+    ),
+    "vetoes with their states": "SELECT * FROM vetocasts v JOIN state s ON s.state_id = v.state_id",
+    "vetoed resolutions with their meetings": (
+        "SELECT * FROM resolution r JOIN meeting m ON m.meeting_id = r.meeting_id AND m.year = r.year "
+        "JOIN vetocasts v ON v.vetoed_resolution = r.draft_id"
+    ),
+}
+INDEXED_QUERIES = {
+    "resolutions of a meeting": (
+        "SELECT * FROM resolution WHERE meeting_id = 'S/PV.3000'",
+        "ix_resolution_meeting_id",
+    ),
+    "meetings of some years": (
+        "SELECT * FROM meeting WHERE year BETWEEN 1994 AND 1999",
+        "ix_meeting_year",
+    ),
+    "resolutions of some years": (
+        "SELECT * FROM resolution WHERE year BETWEEN 1994 AND 1999",
+        "ix_resolution_year",
+    ),
+    "resolutions with a status": (
+        "SELECT * FROM resolution WHERE status = 'vetoed'",
+        "ix_resolution_status",
+    ),
+    "the draft of an adopted resolution": (
+        "SELECT * FROM resolution WHERE final_id = 'S/RES/1000(1995)'",
+        "ix_resolution_final_id",
+    ),
+    "vetoes of a state": (
+        "SELECT * FROM vetocasts WHERE state_id = 1",
+        "ix_vetocasts_state_id",
+    ),
+    "resolutions of the meetings of a year": (
+        "SELECT * FROM meeting m JOIN resolution r ON r.meeting_id = m.meeting_id "
+        "WHERE m.year = 1995",
+        "ix_resolution_meeting_id",
+    ),
+    "transcripts mentioning a word": (
+        "SELECT meeting_id FROM meeting_transcript "
+        "WHERE full_text_tsv @@ plainto_tsquery('english', 'Bosnia')",
+        "meeting_transcript_full_text_tsv_idx",
+    ),
+}
+
+
+class Migrations:
+    """
+    This class brings the schema of a database up to date, by applying the `MIGRATIONS` it misses.
+    """
+
+    def __init__(self, engine: Engine, migrations: list = None) -> None:
+        self.engine: Engine = engine
+        self.migrations: list = migrations if migrations is not None else MIGRATIONS
+
+    def version(self, connection: Connection) -> int:
+        """
+        :return: the version of the last migration applied to the database, 0 for none
+        """
+        return connection.execute(
+            select(func.coalesce(func.max(schema_version.c.version), 0))
+        ).scalar()
+
+    def migrate(self) -> int:
+        """
+        Applies the migrations the database misses, in order, each in its own transaction.
+        If a migration fails, its changes are rolled back, and the ones after it are not applied.
+
+        :return: the version of the database
+        """
+        schema_version.create(self.engine, checkfirst=True)
+
+        version = 0
+        for migration in self.migrations:
+            with self.engine.begin() as connection:
+                # Waits for any other process migrating the database, until the end of the transaction
+                connection.execute(select(func.pg_advisory_xact_lock(MIGRATION_LOCK)))
+
+                version = self.version(connection)
+                if migration.version <= version:
+                    continue
+
+                logger.info(
+                    "Migrating the database to version %s: %s",
+                    migration.version,
+                    migration.description,
+                )
+                migration.apply(connection)
+                connection.execute(
+                    schema_version.insert().values(
+                        version=migration.version,
+                        description=migration.description,
+                        applied_at=datetime.now().isoformat(),
+                    )
+                )
+                version = migration.version
+
+        return version
+
+    def check_query_plans(self) -> bool:
+        """
+        Shows the query plans of the joins of the EDA notebook, and checks the common filters can use their index.
+        Sequential scans are turned off while checking: on small tables they are often cheaper, which says
+        nothing about whether the index could be used once the tables grow.
+
+        :return: True if all filters can use their index
+        """
+        ok = True
+        with self.engine.begin() as connection:
+            for name, query in NOTEBOOK_JOINS.items():
+                plan = self.explain(connection, query)
+                logger.info("%s: %s (cost %s)", name, plan["Node Type"], plan["Total Cost"])
+
+            connection.execute(text("SET LOCAL enable_seqscan = off"))
+            for name, (query, index) in INDEXED_QUERIES.items():
+                indexes = self.indexes_used(self.explain(connection, query))
+                if index in indexes:
+                    logger.info("%s: uses %s", name, index)
+                else:
+                    logger.error(
+                        "%s: does not use %s, but %s", name, index, indexes or "no index"
+                    )
+                    ok = False
+
+        return ok
+
+    @staticmethod
+    def explain(connection: Connection, query: str) -> dict:
+        result = connection.execute(text(f"EXPLAIN (FORMAT JSON) {query}")).scalar()
+        # psycopg2 parses the JSON already
+        plans = json.loads(result) if isinstance(result, str) else result
+        return plans[0]["Plan"]
+
+    @classmethod
+    def indexes_used(cls, plan: dict) -> set:
+        indexes = {plan["Index Name"]} if "Index Name" in plan else set()
+        for child in plan.get("Plans", []):
+            indexes |= cls.indexes_used(child)
+        return indexes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--check-query-plans",
+        help="Check the common queries can use the indexes, after migrating",
+        action="store_true",
+        default=False,
+    )
+    args = parser.parse_args()
+
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.StreamHandler())
+
+    load_dotenv("Database/database.env")
+    db_connection = DBConnection(
+        host=os.getenv("POSTGRES_HOSTNAME"),
+        dbname=os.getenv("POSTGRES_DB"),
+        user=os.getenv("POSTGRES_USER"),
+        password=os.getenv("POSTGRES_PASSWORD"),
+        pool_size=1,
+    )
+    migrations = Migrations(db_connection.get_engine())
+    logger.info("The database is at version %s", migrations.migrate())
+
+    if args.check_query_plans and not migrations.check_query_plans():
+        exit(-1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import logging
+import requests
+import threading
+import time
+
+logger = logging.getLogger("unsc_db_filler")
+
+
+class ODSCredentials:
+    """
+    This class caches the cookies needed to download documents from the UN ODS (Official Document System).
+
+    To get these cookies, we need to log in into a specific server, using a username and password
+    (that apparently is not secret, see `PDFDownloader`). Instead of logging in on every download,
+    we log in once, and reuse the cookies until:
+     - they expire (or, if the server did not tell us when they expire, after `ttl` seconds)
+     - a download looks like it failed because we were not logged in (see `invalidate`)
+
+    One instance is shared by all workers (see `shared`). Only one of them logs in at a time,
+    the others wait and reuse the fresh cookies.
+    """
+
+    LOGIN_URL = "https://documents-dds-ny.un.org/prod/ods_mother.nsf?Login&Username=freeods2&Password=1234"
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, ttl: int = 30 * 60) -> None:
+        self.ttl: int = ttl
+        self.cookies: dict = None
+        self.expires: float = 0
+        # Increases with every login, so we know which cookies a failed download used
+        self.generation: int = 0
+        self.lock: threading.Lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "ODSCredentials":
+        """
+        :return: the instance shared by all PDF downloaders
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def login(self) -> None:
+        """
+        Logs in into the UN ODS server, and keeps the cookies it returns.
+        The caller must hold the lock.
+        """
+        logger.info("Logging in into the UN ODS server")
+
+        # Do NOT follow the redirect..the cookies we need are returned in the 302!!
+        r = requests.get(self.LOGIN_URL, allow_redirects=False)
+
+        self.cookies = dict(r.cookies.items())
+        expiries = [cookie.expires for cookie in r.cookies if cookie.expires]
+        self.expires = min(expiries) if len(expiries) > 0 else time.time() + self.ttl
+        self.generation += 1
+
+    def authenticate(self, session: requests.Session) -> int:
+        """
+        Puts valid login cookies in the cookie jar of the given session. Logs in if needed.
+
+        :param session: the session to authenticate
+        :return: the generation of the cookies used, to pass to `invalidate` if they turn out not to work
+        """
+        with self.lock:
+            if self.cookies is None or time.time() >= self.expires:
+                self.login()
+
+            cookies = self.cookies
+            generation = self.generation
+
+        # The cookies are not bound to a domain: the redirections can bring us to multiple UN servers.
+        for name, value in cookies.items():
+            session.cookies.set(name, value)
+
+        return generation
+
+    def invalidate(self, generation: int) -> None:
+        """
+        Forgets the cookies, so the next `authenticate` logs in again.
+        If another worker already logged in again since the given generation, nothing happens.
+
+        :param generation: the generation of the cookies which did not work
+        """
+        with self.lock:
+            if generation == self.generation:
+                logger.info("UN ODS login cookies do not seem to work (anymore)...")
+                self.cookies = None
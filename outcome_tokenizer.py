@@ -0,0 +1,119 @@
+"""
+The outcome of a UNSC meeting, as listed in the meeting tables, tells which resolutions were voted on, and how.
+For example:
+
+    'Draft resolution S/2019/961 vetoed by Russian Federation and China\\n\\t13-2-0 \\n\\tS/2019/962 not adopted5-6-4'
+
+This module finds everything we need in such an outcome in a single pass, with precompiled patterns.
+"""
+from typing import NamedTuple
+
+import re
+
+# The kinds of tokens
+DRAFT = "draft"
+FINAL = "final"
+VOTE = "vote"
+VETOED_BY = "vetoed by"
+
+# The status of a draft or final resolution
+VETOED = "vetoed"
+NOT_ADOPTED = "not adopted"
+ADOPTED = "adopted"
+
+# Does a cell of a meeting table mention a draft or adopted resolution?
+RESOLUTION_MENTION = re.compile(
+    r"S/[0-9]{1,5}|S/[0-9]{4}\/[0-9]{1,4}|S/RES/[0-9]{1,4}\s?\(?[0-9]{4}\)?"
+)
+# Same, for the tables before 1994, where the meeting record itself can be mentioned as well
+RESOLUTION_OR_MEETING_MENTION = re.compile(
+    r"S/PV.[0-9]{1,4}|S/[0-9]{1,5}|S/[0-9]{4}/[0-9]{1,4}|S/RES/[0-9]{1,4}\s?\(?[0-9]{4}\)?"
+)
+# The first letter or document in the "Letter with Vote Procedure / Briefings" column of the COVID tables
+LETTER = re.compile(r"S\/[0-9]{4}\/[0-9]{0,3}")
+
+# A vetoed draft resolution has the format `S/YYYY/X vetoed by` - `S/YYYY/XXXX vetoed by`
+# where YYYY is the year and X is the Xth draft resolution of that year.
+# In the earlier days of the UNSC, draft resolutions had the format `S/X - S/XXXXX`
+# In the first 2 years of the UNSC, draft resolutions also show up as `S/PV.X`
+# In 1986 we also see draft resolutions of the form `S/XXXX/Rev.Y`
+# It can be between parentheses, we only need what is inside.
+# What follows `vetoed by` are the states which vetoed it. They are looked ahead at only, as they
+# are followed by the next resolution without any separator at times.
+_VETOED = (
+    r"(?P<vetoed>S/[0-9]{1,5}/Rev.[0-9]+|S/PV.[0-9]{1,4}|S/[0-9]{1,5}|S/[0-9]{4}/[0-9]{1,4})\)?"
+    r"\s*\(?[a-zA-Z\s]*\)*\s*vetoed by(?=(?P<vetoed_by>(?:(?!S/)[a-zA-Z\s,.])*))"
+)
+# A not adopted draft resolution has the same formats, without the `/Rev.Y`
+_NOT_ADOPTED = (
+    r"(?P<not_adopted>S/[0-9]{1,5}|S/PV.[0-9]{1,4}|S/[0-9]{4}/[0-9]{1,4})\s*not adopted"
+)
+# An adopted resolution has the format `S/RES/X` - `S/RES/XXXX (YYYY)` where X is the number and YYYY the year.
+# Some of them have whitespace in their id, which is not how they are referenced in URLs and other data sources.
+# We allow whitespace anywhere in the id, and remove it from the token.
+_ADOPTED = r"(?P<adopted>S\s*/\s*R\s*E\s*S\s*/\s*[0-9](?:\s*[0-9]){0,3}(?:\s*\()?\s*[0-9](?:\s*[0-9]){3}(?:\s*\))?)"
+# A vote tally: in favour - against - abstentions
+_VOTE = r"(?<![0-9])(?P<vote>[0-9]{1,2}-[0-9]{1,2}-[0-9]{1,2})(?![0-9])"
+
+# Tokens only start at an `S` or a digit. Checking that first, saves trying every pattern at every position.
+_TOKEN = re.compile(
+    rf"(?=[S0-9])(?:(?=S)(?:{_VETOED}|{_NOT_ADOPTED}|{_ADOPTED})|{_VOTE})"
+)
+_WHITESPACE = re.compile(r"\s+")
+
+
+class Token(NamedTuple):
+    # DRAFT, FINAL, VOTE or VETOED_BY
+    kind: str
+    # The id of the resolution, the vote tally (e.g. '13-2-0'), or the states which vetoed a draft
+    value: str
+    # VETOED, NOT_ADOPTED or ADOPTED for resolutions, None for the others
+    status: str = None
+
+
+def tokenize(outcome: str) -> list:
+    """
+    Finds all draft resolutions, adopted resolutions, vote tallies and vetoing states in an outcome,
+    in the order they appear in.
+
+    :param outcome: the outcome of a meeting
+    :return: a list of Tokens
+    """
+    tokens = []
+    for match in _TOKEN.finditer(outcome):
+        # The last group of a vetoed draft is the states which vetoed it
+        kind = match.lastgroup
+        if kind == "vote":
+            tokens.append(Token(VOTE, match.group("vote")))
+        elif kind == "adopted":
+            tokens.append(Token(FINAL, _WHITESPACE.sub("", match.group("adopted")), ADOPTED))
+        elif kind == "not_adopted":
+            tokens.append(Token(DRAFT, match.group("not_adopted"), NOT_ADOPTED))
+        else:
+            tokens.append(Token(DRAFT, match.group("vetoed"), VETOED))
+            tokens.append(Token(VETOED_BY, match.group("vetoed_by").strip()))
+
+    return tokens
+
+
+class Outcome:
+    """
+    The tokens of an outcome, grouped the way we need them to build a meeting.
+    """
+
+    def __init__(self, outcome: str) -> None:
+        self.tokens: list = tokenize(outcome)
+        self.vetoed_drafts: list = []
+        self.not_adopted_drafts: list = []
+        self.adopted_resolutions: list = []
+        self.votes: list = []
+
+        for kind, value, status in self.tokens:
+            if status == VETOED:
+                self.vetoed_drafts.append(value)
+            elif status == NOT_ADOPTED:
+                self.not_adopted_drafts.append(value)
+            elif status == ADOPTED:
+                self.adopted_resolutions.append(value)
+            elif kind == VOTE:
+                self.votes.append(value)
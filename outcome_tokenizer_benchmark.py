@@ -0,0 +1,85 @@
+"""
+Compares the outcome tokenizer with the regular expressions it replaced, on all outcomes in the
+downloaded UNSC meeting tables: first whether they find the same resolutions, then how long they take.
+
+    $ python outcome_tokenizer_benchmark.py
+"""
+import glob
+import re
+import timeit
+
+from meeting_html_parser import MeetingHTMLParser
+from outcome_tokenizer import Outcome
+
+SCRATCH_FOLDER = "UNDataScraping/scratch"
+
+
+# The functions the tokenizer replaced, as they were
+def find_not_adopted_draft_resolution_mentioned_in(target: str) -> list:
+    return re.findall(
+        "(S/[0-9]{1,5}|S/PV.[0-9]{1,4}|S/[0-9]{4}/[0-9]{1,4})\s*\n*\t*\r*not adopted", target
+    )
+
+
+def find_vetoed_draft_resolution_mentioned_in(target: str) -> list:
+    return re.findall(
+        "\(?(S/[0-9]{1,5}/Rev.[0-9]+|S/PV.[0-9]{1,4}|S/[0-9]{1,5}|S/[0-9]{4}/[0-9]{1,4})\)?\s*\n*\t*\r*\(?[a-zA-Z\s]*\)*\s*\n*\t*\r*vetoed by",
+        target,
+    )
+
+
+def find_adopted_resolution_mentioned_in(target: str) -> list:
+    target = re.sub("\s+", "", target)
+    return re.findall("S\/RES\/[0-9]{1,4}\s?\(?[0-9]{4}\)?", target)
+
+
+def with_regular_expressions(outcome: str) -> tuple:
+    return (
+        find_vetoed_draft_resolution_mentioned_in(outcome),
+        find_not_adopted_draft_resolution_mentioned_in(outcome),
+        find_adopted_resolution_mentioned_in(outcome),
+    )
+
+
+def with_tokenizer(outcome: str) -> tuple:
+    tokens = Outcome(outcome)
+    return tokens.vetoed_drafts, tokens.not_adopted_drafts, tokens.adopted_resolutions
+
+
+def read_outcomes() -> list:
+    outcomes = []
+    for file in sorted(glob.glob(f"{SCRATCH_FOLDER}/scact*_table_en.html")):
+        if file.endswith("scact_veto_table_en.html"):
+            continue
+        with open(file, "r") as f:
+            records = MeetingHTMLParser(f.read()).extract_records()
+        outcomes += [record["outcome"] for record in records]
+
+    return outcomes
+
+
+def main() -> None:
+    outcomes = read_outcomes()
+    print(f"{len(outcomes)} outcomes")
+
+    mismatches = [
+        outcome
+        for outcome in outcomes
+        if with_regular_expressions(outcome) != with_tokenizer(outcome)
+    ]
+    print(f"{len(mismatches)} outcomes give a different result")
+    for outcome in mismatches:
+        print(f"  {outcome!r}")
+
+    for name, function in [
+        ("regular expressions", with_regular_expressions),
+        ("tokenizer", with_tokenizer),
+    ]:
+        seconds = min(
+            timeit.repeat(lambda: [function(outcome) for outcome in outcomes], number=10, repeat=5)
+        )
+        print(f"{name}: {seconds / 10 * 1000:.1f} ms for all outcomes")
+
+
+if __name__ == "__main__":
+    main()
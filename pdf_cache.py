@@ -0,0 +1,195 @@
+from datetime import datetime
+
+import hashlib
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger("unsc_db_filler")
+
+
+class PDFCache:
+    """
+    This class keeps a manifest of the PDFs we downloaded before, so we don't need to download them again.
+
+    For every downloaded PDF file, the manifest holds:
+     - the id of the meeting or resolution (document_id)
+     - the sha256 hash of its content (sha256)
+     - its size in bytes (size)
+     - where we downloaded it from (url)
+     - when we downloaded it (fetched_at)
+     - whether the file on disk is still what we downloaded (status: valid or invalid)
+
+    The manifest is a JSON lines file. Every change appends a line, the last line for a file wins.
+    That way a crash in the middle of a run never corrupts what we already know.
+    `verify` checks all files against their hash, and compacts the manifest again.
+
+    The cache is thread-safe, one instance can be shared by all PDFDownloaders.
+    """
+
+    VALID = "valid"
+    INVALID = "invalid"
+
+    def __init__(self, manifest_file: str) -> None:
+        self.manifest_file: str = manifest_file
+        self.entries: dict = {}
+        self.lock: threading.Lock = threading.Lock()
+        self.read_manifest()
+
+    def read_manifest(self) -> None:
+        """
+        Reads the manifest file, if there is one.
+        """
+        if not os.path.exists(self.manifest_file):
+            return
+
+        with open(self.manifest_file, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A half written line, when we crashed while appending it
+                    continue
+                self.entries[entry["file"]] = entry
+
+        logger.info("Read %s entries from PDF cache manifest '%s'", len(self.entries), self.manifest_file)
+
+    def is_valid(self, file: str) -> bool:
+        """
+        Checks if we have a valid, earlier downloaded, copy of a given file.
+
+        PDFs downloaded before we kept a manifest are checked on being a PDF,
+        and when they are, added to the manifest.
+
+        :param file: the path of the PDF file
+        :return: True if the file on disk can be used without downloading it again
+        """
+        if not os.path.exists(file):
+            return False
+
+        with self.lock:
+            entry = self.entries.get(file)
+
+        if entry is None:
+            return self.adopt(file)
+
+        return entry["status"] == self.VALID and entry["size"] == os.path.getsize(file)
+
+    def get_sha256(self, file: str) -> str:
+        """
+        :param file: the path of the PDF file
+        :return: the sha256 hash of the file as recorded in the manifest, or None if we don't know it
+        """
+        with self.lock:
+            entry = self.entries.get(file)
+
+        if entry is None or entry["status"] != self.VALID:
+            return None
+
+        return entry["sha256"]
+
+    def adopt(self, file: str) -> bool:
+        """
+        Adds a PDF which was downloaded before we kept a manifest, if it looks like a PDF.
+
+        :param file: the path of the PDF file
+        :return: True if the file was added to the manifest as a valid PDF
+        """
+        with open(file, "rb") as f:
+            if f.read(5) != b"%PDF-":
+                return False
+
+        self.put(
+            document_id=None,
+            file=file,
+            url=None,
+            sha256=self.hash_file(file),
+            size=os.path.getsize(file),
+        )
+        return True
+
+    def put(self, document_id: str, file: str, url: str, sha256: str, size: int) -> None:
+        """
+        Adds a freshly downloaded PDF to the manifest.
+
+        :param document_id: the id of the meeting or resolution
+        :param file: the path the PDF was written to
+        :param url: where the PDF was downloaded from
+        :param sha256: the sha256 hash of the PDF content
+        :param size: the size of the PDF in bytes
+        """
+        entry = {
+            "document_id": document_id,
+            "file": file,
+            "sha256": sha256,
+            "size": size,
+            "url": url,
+            "fetched_at": datetime.now().isoformat(),
+            "status": self.VALID,
+        }
+        with self.lock:
+            self.entries[file] = entry
+            self.append(entry)
+
+    def append(self, entry: dict) -> None:
+        """
+        Appends an entry to the manifest file. The caller must hold the lock.
+        """
+        with open(self.manifest_file, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def verify(self) -> dict:
+        """
+        Checks every PDF in the manifest against its size and sha256 hash.
+        Missing or changed files are marked invalid, so they'll be downloaded again.
+        Afterwards, the manifest file is rewritten with one line per file.
+
+        :return: the amount of valid, invalid and missing files
+        """
+        result = {"valid": 0, "invalid": 0, "missing": 0}
+
+        with self.lock:
+            for file, entry in self.entries.items():
+                if not os.path.exists(file):
+                    entry["status"] = self.INVALID
+                    result["missing"] += 1
+                elif (
+                    os.path.getsize(file) != entry["size"]
+                    or self.hash_file(file) != entry["sha256"]
+                ):
+                    logger.info("PDF '%s' does not match the manifest", file)
+                    entry["status"] = self.INVALID
+                    result["invalid"] += 1
+                else:
+                    entry["status"] = self.VALID
+                    result["valid"] += 1
+
+            tmp_file = f"{self.manifest_file}.tmp"
+            with open(tmp_file, "w") as f:
+                for entry in self.entries.values():
+                    f.write(json.dumps(entry) + "\n")
+            os.replace(tmp_file, self.manifest_file)
+
+        logger.info(
+            "Verified PDF cache: %s valid, %s invalid, %s missing",
+            result["valid"],
+            result["invalid"],
+            result["missing"],
+        )
+        return result
+
+    @staticmethod
+    def hash_file(file: str) -> str:
+        """
+        Calculates the sha256 hash of a given file
+
+        :param file: the path to the file
+        :return: the hex digest of the file's sha256 hash
+        """
+        sha256 = hashlib.sha256()
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(chunk)
+
+        return sha256.hexdigest()
@@ -1,7 +1,9 @@
 from fake_useragent import UserAgent
+import itertools
 import logging
 import os
 import shutil
+import threading
 import requests
 import magic
 import mimetypes
@@ -9,11 +11,19 @@ import requests
 from lxml import html
 from urllib.parse import urljoin
 
+from ods_credentials import ODSCredentials
+from pdf_cache import PDFCache
+from rate_limiter import RateLimiter
+from retry_policy import NOT_YET_PUBLISHED, TRANSIENT, classify_status
+
 logger = logging.getLogger("unsc_db_filler")
 
 
 class DownloadFailed(Exception):
-    pass
+    def __init__(self, message: str, error_class: str = TRANSIENT) -> None:
+        super().__init__(message)
+        # See `retry_policy.classify`
+        self.error_class: str = error_class
 
 
 class PDFDownloader:
@@ -29,28 +39,53 @@ class PDFDownloader:
     and password (that apparently is not secret..the point of it is void as such), to receive a bunch of cookies
     needed to ask the final PDF download.
 
-    """
-
-    def __init__(self, path: str = "./") -> None:
-        self.path: str = path
+    Those cookies are cached in an `ODSCredentials` instance, by default the one shared by all PDFDownloaders,
+    so we only log in again when the cookies expired or stopped working.
 
-    def get_cookie_string(self) -> str:
-        """
-        Return a cookie string to authenticate the PDF download against the UN.org data serving platform
+    When a `PDFCache` is given, PDFs which were downloaded before are not downloaded again,
+    unless `refresh` is set.
 
-        :return: the cookie string
-        """
+    Responses are streamed: PDFs are written to disk in chunks of `CHUNK_SIZE` bytes, to a `.part` file
+    which is only renamed to its final name when complete. If the UN servers drop the connection
+    halfway, we continue where we stopped using an HTTP `Range` request.
 
-        uri = "https://documents-dds-ny.un.org/prod/ods_mother.nsf?Login&Username=freeods2&Password=1234"
+    Every request goes through a `RateLimiter`, by default the one shared by all downloaders,
+    which keeps us within the politeness budget of the UN servers.
 
-        # Do NOT follow the redirect..the cookies we need are returned in the 302!!
-        r = requests.get(uri, allow_redirects=False)
+    Downloads of the same document take turns, even across downloaders: the second one waits until the first
+    is done, and then finds the PDF in the cache (when not refreshing). So the `.part` file a download finds
+    was left behind by an earlier, interrupted, attempt, never by one still running.
 
-        cookie_string = ""
-        for cookie, cookie_val in r.cookies.items():
-            cookie_string += f"{cookie}={cookie_val};"
+    """
 
-        return cookie_string
+    # Amount of bytes to write to disk at once
+    CHUNK_SIZE = 64 * 1024
+    # Amount of bytes to look at to find out what type of document we received
+    SNIFF_SIZE = 2048
+    # How many times we continue an interrupted download, before giving up
+    MAX_RESUMES = 5
+
+    # A lock for every file we download to, see `lock_for`
+    _file_locks: dict = {}
+    _file_locks_lock = threading.Lock()
+
+    def __init__(
+        self,
+        path: str = "./",
+        credentials: ODSCredentials = None,
+        cache: PDFCache = None,
+        refresh: bool = False,
+        rate_limiter: RateLimiter = None,
+    ) -> None:
+        self.path: str = path
+        self.credentials: ODSCredentials = (
+            credentials if credentials is not None else ODSCredentials.shared()
+        )
+        self.rate_limiter: RateLimiter = (
+            rate_limiter if rate_limiter is not None else RateLimiter.shared()
+        )
+        self.cache: PDFCache = cache
+        self.refresh: bool = refresh
 
     def test_for_meta_redirections(
         self, r: requests.Response
@@ -62,11 +97,13 @@ class PDFDownloader:
         :return: (True, new URL) if there is a redirect in the response found, (False, None) if no redirects can be found any longer.
         """
         # Credits to https://stackoverflow.com/questions/2318446/how-to-follow-meta-refreshes-in-python
-        mime = magic.from_buffer(r.content, mime=True)
+        mime = magic.from_buffer(self.read_head(r), mime=True)
         extension = mimetypes.guess_extension(mime)
 
         if extension == ".html":
-            html_tree = html.fromstring(r.text)
+            # Web pages are small, we can read the rest of them in memory
+            content = self.read_head(r) + r.content
+            html_tree = html.fromstring(content.decode(r.encoding or "utf-8", errors="replace"))
             refresh_attribute = html_tree.xpath(
                 "//meta[translate(@http-equiv, 'REFSH', 'refsh') = 'refresh']/@content"
             )
@@ -76,7 +113,11 @@ class PDFDownloader:
             # The Digital Library personnel informed me that all documents need to be translated to multiple languages
             # and this can take a few days... . As such
             if len(refresh_attribute) == 0:
-                raise DownloadFailed(f"The download failed...is the document you're trying to fetch maybe not yet available?")
+                self.rate_limiter.slow_down(r.url)
+                raise DownloadFailed(
+                    f"The download failed...is the document you're trying to fetch maybe not yet available?",
+                    error_class=NOT_YET_PUBLISHED,
+                )
 
             # example attr: ['1; URL=/tmp/6596179.00848389.html']
             refresh_attribute = refresh_attribute[0]
@@ -103,9 +144,8 @@ class PDFDownloader:
         """
         redirected, url = self.test_for_meta_redirections(r)
         if redirected:
-            cookie = self.get_cookie_string()
-            headers = {"Cookie": cookie}
-            r = self.follow_redirections(s.get(url, headers=headers), s)
+            # The login cookies are already in the session's cookie jar, see `download_pdf`
+            r = self.follow_redirections(self.get(s, url, stream=True), s)
 
         return r
 
@@ -126,13 +166,46 @@ class PDFDownloader:
 
         file_to_write = f"{self.path}/{file_to_write}"
 
+        with self.lock_for(file_to_write):
+            return self.fetch(what_to_fetch, uri, file_to_write)
+
+    @classmethod
+    def lock_for(cls, file_to_write: str) -> threading.Lock:
+        """
+        :param file_to_write: the file a document is downloaded to
+        :return: the lock to hold while downloading to the file
+        """
+        with cls._file_locks_lock:
+            return cls._file_locks.setdefault(os.path.abspath(file_to_write), threading.Lock())
+
+    def fetch(self, what_to_fetch: str, uri: str, file_to_write: str) -> str:
+        """
+        Downloads a resolution or meeting transcript to the given file, unless it's in the cache already.
+        The caller must hold the lock of the file, see `lock_for`.
+
+        :param what_to_fetch: the original ID of the meeting or resolution to download
+        :param uri: the url to download it from, or None for its undocs.org url
+        :param file_to_write: the file to write it to
+        :return: the filename written to disk
+        """
+        if self.cache is not None and not self.refresh and self.cache.is_valid(file_to_write):
+            logger.info("Using the earlier downloaded PDF '%s' for '%s'", file_to_write, what_to_fetch)
+            return file_to_write
+
         if uri == None:
             uri = f"http://www.undocs.org/en/{what_to_fetch}"
 
         s = requests.Session()
-        r = s.get(uri, allow_redirects=True)
+        generation = self.credentials.authenticate(s)
+        r = self.get(s, uri, allow_redirects=True, stream=True)
         with self.follow_redirections(r, s) as r:
-            if r.status_code == 200:
+            if r.status_code in (401, 403) or "?Login" in r.url:
+                # Looks like our login cookies are not accepted (anymore). Log in again next time.
+                self.credentials.invalidate(generation)
+                raise DownloadFailed(
+                    f"Unable to download {what_to_fetch}...we do not seem to be logged in (status code {r.status_code})"
+                )
+            elif r.status_code == 200:
                 # Of course... the UN now always returns a 200 OK... even if what we ask is nonsense...
                 # great....... So now we need to check if what they return is actually a PDF or not.
                 content_type = r.headers.get('Content-Type')
@@ -141,14 +214,114 @@ class PDFDownloader:
                     raise DownloadFailed(
                         f"Unable to download {what_to_fetch}...we received content-type '{content_type}' instead of 'application/pdf'"
                     )
-                with open(file_to_write, "wb") as f:
-                    f.write(r.content)
+                self.stream_to_disk(r, s, file_to_write)
+
+                if self.cache is not None:
+                    self.cache.put(
+                        document_id=what_to_fetch,
+                        file=file_to_write,
+                        url=uri,
+                        sha256=PDFCache.hash_file(file_to_write),
+                        size=os.path.getsize(file_to_write),
+                    )
             else:
                 logger.info(
                     f"Unable to download {what_to_fetch}...status code was {r.status_code}"
                 )
                 raise DownloadFailed(
-                    f"Unable to download {what_to_fetch}...status code was {r.status_code}"
+                    f"Unable to download {what_to_fetch}...status code was {r.status_code}",
+                    error_class=classify_status(r.status_code),
                 )
 
         return file_to_write
+
+    def get(self, s: requests.Session, url: str, **kwargs) -> requests.Response:
+        """
+        Sends a GET request within the budget of the rate limiter, and tells it how the server answered
+
+        :param s: The Session to use
+        :param url: The url to get
+        :return: the Response
+        """
+        self.rate_limiter.acquire(url)
+        r = s.get(url, **kwargs)
+        # After following HTTP redirects, it might be another host that answered
+        self.rate_limiter.record(r.url, r.status_code)
+
+        return r
+
+    def read_head(self, r: requests.Response) -> bytes:
+        """
+        Reads the first `SNIFF_SIZE` bytes of a streamed response, to find out what's in it.
+        The bytes are kept on the response, the rest of the content stays in the stream.
+
+        :param r: the streamed response
+        :return: the first bytes of the response content
+        """
+        if getattr(r, "head", None) is None:
+            r.head = r.raw.read(self.SNIFF_SIZE, decode_content=True)
+
+        return r.head
+
+    def stream_to_disk(
+        self, r: requests.Response, s: requests.Session, file_to_write: str
+    ) -> None:
+        """
+        Writes the content of a streamed response to disk in chunks.
+
+        The content is written to `<file_to_write>.part` first, and renamed when complete.
+        If a `.part` file of an earlier, interrupted, attempt exists, or the connection drops while
+        downloading, we ask the server for the remaining bytes only.
+
+        :param r: the streamed response of the document
+        :param s: the Session to use for asking the remaining bytes
+        :param file_to_write: the file to write the document to
+        """
+        part_file = f"{file_to_write}.part"
+        url = r.url
+        offset = os.path.getsize(part_file) if os.path.exists(part_file) else 0
+        resumes = 0
+
+        while True:
+            if offset > 0:
+                logger.info("Resuming download of '%s' from byte %s", url, offset)
+                r.close()
+                r = self.get(s, url, headers={"Range": f"bytes={offset}-"}, stream=True)
+
+            try:
+                if r.status_code == 206:
+                    mode = "ab"
+                    chunks = r.iter_content(chunk_size=self.CHUNK_SIZE)
+                elif r.status_code == 200 and r.headers.get("Content-Type") == "application/pdf":
+                    # The server sends us the whole document (again), start from scratch
+                    mode = "wb"
+                    chunks = itertools.chain(
+                        [self.read_head(r)], r.iter_content(chunk_size=self.CHUNK_SIZE)
+                    )
+                else:
+                    # Whatever we have, we can't continue it. Start from scratch next time.
+                    if os.path.exists(part_file):
+                        os.remove(part_file)
+                    raise DownloadFailed(
+                        f"Unable to resume the download of {url}...status code was {r.status_code}"
+                    )
+
+                with open(part_file, mode) as f:
+                    for chunk in chunks:
+                        f.write(chunk)
+                break
+
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.ChunkedEncodingError,
+            ) as e:
+                resumes += 1
+                if resumes > self.MAX_RESUMES:
+                    raise DownloadFailed(
+                        f"Unable to download {url}...connection dropped {resumes} times: {e}"
+                    )
+                offset = os.path.getsize(part_file) if os.path.exists(part_file) else 0
+            finally:
+                r.close()
+
+        os.replace(part_file, file_to_write)
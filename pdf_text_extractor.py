@@ -0,0 +1,106 @@
+import concurrent.futures
+import fitz
+import logging
+import multiprocessing
+import os
+
+from pdf_cache import PDFCache
+from text_cache import TextCache
+
+logger = logging.getLogger("unsc_db_filler")
+
+
+def extract_pages(pdf: str, start: int, stop: int) -> str:
+    """
+    Reads the text of the pages `start` until (not including) `stop` of a given pdf file.
+    This function runs in the worker processes of the `PDFTextExtractor`.
+
+    :param pdf: The Path to the PDF
+    :param start: The first page to read
+    :param stop: The page to stop reading at
+    :return: The text found on those pages
+    """
+    with fitz.open(pdf) as doc:
+        return "".join(page.get_text() for page in doc.pages(start, stop))
+
+
+class PDFTextExtractor:
+    """
+    This class extracts the text of PDF files in a pool of processes.
+
+    Extracting text is CPU-bound work. Doing it in the download threads makes it compete with them for the GIL,
+    and limits it to a single core. Large documents, like long debate transcripts, are split into
+    ranges of `pages_per_task` pages, which are extracted in parallel and joined back in order.
+
+    When a text cache folder is given, extracted texts are kept in a `TextCache`, and PDFs we extracted before
+    are not extracted again.
+
+    The extractor can be shared by all workers. Call `shutdown` when done, to stop the processes.
+    """
+
+    # Bump this whenever a change to the extraction changes the extracted text
+    VERSION = "1"
+
+    def __init__(
+        self, processes: int = None, pages_per_task: int = 20, cache_folder: str = None
+    ) -> None:
+        self.processes: int = processes if processes is not None else os.cpu_count()
+        self.pages_per_task: int = pages_per_task
+        # The processes are only started once the workers are running, and forking a process while other threads
+        # hold a lock (e.g. of the logging or SSL module) can deadlock it. Spawned processes start clean.
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.processes, mp_context=multiprocessing.get_context("spawn")
+        )
+
+        # The text PyMuPDF extracts can differ between its versions as well
+        self.cache: TextCache = (
+            TextCache(cache_folder, version=f"{self.VERSION}-{fitz.VersionBind}")
+            if cache_folder is not None
+            else None
+        )
+
+    def extract(self, pdf: str, sha256: str = None) -> str:
+        """
+        Reads the text of a given pdf file, and returns it as unicode UTF-8 encoded text
+
+        :param pdf: The Path to the PDF
+        :param sha256: The sha256 hash of the PDF, if already known
+        :return: The text found inside the PDF UTF-8 encoded
+        """
+        if self.cache is None:
+            return self.extract_text(pdf)
+
+        if sha256 is None:
+            sha256 = PDFCache.hash_file(pdf)
+
+        text = self.cache.get(sha256)
+        if text is not None:
+            logger.info("Using the earlier extracted text of '%s'", pdf)
+            return text
+
+        text = self.extract_text(pdf)
+        self.cache.put(sha256, text)
+
+        return text
+
+    def extract_text(self, pdf: str) -> str:
+        """
+        Extracts the text of a given pdf file in the process pool
+
+        :param pdf: The Path to the PDF
+        :return: The text found inside the PDF UTF-8 encoded
+        """
+        with fitz.open(pdf) as doc:
+            page_count = doc.page_count
+
+        futures = [
+            self.executor.submit(
+                extract_pages, pdf, start, min(start + self.pages_per_task, page_count)
+            )
+            for start in range(0, page_count, self.pages_per_task)
+        ]
+
+        return "".join(future.result() for future in futures)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown()
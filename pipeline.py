@@ -0,0 +1,100 @@
+import concurrent.futures
+import logging
+
+from job import Job
+from job_queue import JobQueue
+from retry_policy import CircuitBreaker
+
+logger = logging.getLogger("unsc_db_filler")
+
+
+class Stage:
+    """
+    A stage of a `Pipeline`. It has its own job queue, processed by `workers` threads.
+
+    The function of a stage processes one job, and returns the jobs for the next stage (or None).
+    Those are only passed on when the function succeeded. When it fails, only this stage its job is retried.
+
+    Give the stages which talk to the same hosts the same `CircuitBreaker`, so the failures of one stage
+    pause the others too. The first stage can be given the `job_queue` it takes its jobs from
+    (`maxsize` and `retries` are only used when it is not given).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        function,
+        workers: int = 1,
+        maxsize: int = 0,
+        retries: int = 20,
+        breaker: CircuitBreaker = None,
+        job_queue: JobQueue = None,
+    ) -> None:
+        self.name: str = name
+        self.function = function
+        self.workers: int = workers
+        self.job_queue: JobQueue = (
+            job_queue
+            if job_queue is not None
+            else JobQueue(retries=retries, maxsize=maxsize, breaker=breaker)
+        )
+
+
+class Pipeline:
+    """
+    This class chains stages: the jobs one stage produces are queued to the next stage.
+    All stages run at the same time, each with their own amount of workers, so for example downloading
+    and extracting text don't need to wait for each other.
+
+    Stage queues can be bounded (`maxsize`), so a fast stage can't run far ahead of a slow one.
+    """
+
+    def __init__(self, stages: list) -> None:
+        self.stages: list = stages
+
+    def run(self) -> set:
+        """
+        Runs all jobs in the queue of the first stage through the stages of the pipeline.
+        Returns when all stages processed all their jobs.
+
+        :return: the jobs which failed, in any of the stages
+        """
+        for stage in self.stages[1:]:
+            stage.job_queue.open()
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(self.stages)) as executor:
+            futures = [
+                executor.submit(self.run_stage, stage, next_stage)
+                for stage, next_stage in zip(self.stages, self.stages[1:] + [None])
+            ]
+            for future in futures:
+                future.result()
+
+        failed = set()
+        for stage in self.stages:
+            if len(stage.job_queue.failed) > 0:
+                logger.info("%s jobs failed in stage '%s'", len(stage.job_queue.failed), stage.name)
+            failed.update(stage.job_queue.failed)
+
+        return failed
+
+    def run_stage(self, stage: Stage, next_stage: Stage) -> None:
+        """
+        Processes the jobs of a stage, and passes the jobs it produces on to the next stage.
+        When the stage is done, the next stage is told no more jobs are coming.
+
+        :param stage: the stage to run
+        :param next_stage: the stage after it, or None if it's the last stage
+        """
+
+        def process(job: Job) -> None:
+            next_jobs = stage.function(job)
+            if next_stage is not None and next_jobs is not None:
+                for next_job in next_jobs:
+                    next_stage.job_queue.enqueue(next_job)
+
+        try:
+            stage.job_queue.run(process, workers=stage.workers, name=stage.name)
+        finally:
+            if next_stage is not None:
+                next_stage.job_queue.close()
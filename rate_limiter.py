@@ -0,0 +1,172 @@
+from urllib.parse import urlparse
+
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger("unsc_db_filler")
+
+
+class TokenBucket:
+    """
+    The budget of requests for one host: `rate` requests per second, with bursts of at most `burst` requests.
+    """
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.max_rate: float = rate
+        self.rate: float = rate
+        self.burst: float = burst
+        self.tokens: float = burst
+        self.updated: float = time.monotonic()
+
+    def reserve(self) -> float:
+        """
+        Takes a token from the bucket. When there is none, the token is borrowed from the future.
+
+        :return: how many seconds to wait before the token may be used
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+
+        return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class RateLimiter:
+    """
+    This class keeps the requests we send to the UN web servers within a politeness budget per host.
+
+    Every host has a token bucket: every request takes a token, and tokens come back at the rate of the host.
+    Hosts without a rate of their own share `default_rate`. Subdomains use the rate of their domain,
+    so `www.undocs.org` uses the rate of `undocs.org`.
+
+    The rate adapts to how the servers cope: it is halved whenever a server answers with a 429 or 5xx,
+    or with a page saying a document is not available (see `slow_down`), and grows back to the configured
+    rate with every successful request (see `speed_up`).
+
+    One instance is shared by all downloaders (see `shared`).
+    """
+
+    # Requests per second
+    RATES = {
+        "un.org": 4.0,
+        "undocs.org": 2.0,
+        "documents-dds-ny.un.org": 2.0,
+    }
+    # The rate never drops below this, however bad things get
+    MIN_RATE = 0.1
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, rates: dict = None, default_rate: float = 1.0) -> None:
+        self.rates: dict = dict(rates if rates is not None else self.RATES)
+        self.default_rate: float = default_rate
+        self.buckets: dict = {}
+        self.lock: threading.Lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "RateLimiter":
+        """
+        :return: the instance shared by all HTML and PDF downloaders
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def set_rate(self, host: str, rate: float) -> None:
+        """
+        Configures the amount of requests per second we send to a host
+
+        :param host: the host, e.g. `undocs.org`
+        :param rate: the amount of requests per second
+        """
+        with self.lock:
+            self.rates[host] = rate
+            self.buckets.pop(host, None)
+
+    def acquire(self, url: str) -> None:
+        """
+        Waits until a request to the host of the given url fits in its budget
+
+        :param url: the url we're about to request
+        """
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, url: str) -> None:
+        """
+        Same as `acquire`, but waits without blocking the event loop
+
+        :param url: the url we're about to request
+        """
+        wait = self.reserve(url)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def reserve(self, url: str) -> float:
+        with self.lock:
+            return self.bucket(url).reserve()
+
+    def record(self, url: str, status_code: int) -> None:
+        """
+        Adapts the rate of a host to the status code of a response it gave
+
+        :param url: the url we requested
+        :param status_code: the status code of the response
+        """
+        if status_code == 429 or status_code >= 500:
+            self.slow_down(url)
+        else:
+            self.speed_up(url)
+
+    def slow_down(self, url: str) -> None:
+        """
+        Halves the rate of the host of the given url
+
+        :param url: the url which gave an answer telling us to slow down
+        """
+        with self.lock:
+            bucket = self.bucket(url)
+            bucket.rate = max(self.MIN_RATE, bucket.rate / 2)
+            logger.info("Slowing down to %.2f requests per second for '%s'", bucket.rate, url)
+
+    def speed_up(self, url: str) -> None:
+        """
+        Grows the rate of the host of the given url back to its configured rate, a tenth of it at a time
+
+        :param url: the url which gave a good answer
+        """
+        with self.lock:
+            bucket = self.bucket(url)
+            bucket.rate = min(bucket.max_rate, bucket.rate + bucket.max_rate / 10)
+
+    def bucket(self, url: str) -> TokenBucket:
+        """
+        Returns the bucket of the host of the given url. The caller must hold the lock.
+        """
+        host = self.host(url)
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            rate = self.rates.get(host, self.default_rate)
+            bucket = self.buckets[host] = TokenBucket(rate, burst=max(1.0, rate))
+
+        return bucket
+
+    def host(self, url: str) -> str:
+        """
+        :param url: a url
+        :return: the configured host the url belongs to, or its own hostname if it has no rate configured.
+        The caller must hold the lock.
+        """
+        hostname = (urlparse(url).hostname or "").lower()
+        # The most specific host first, documents-dds-ny.un.org is not un.org
+        for host in sorted(self.rates, key=len, reverse=True):
+            if hostname == host or hostname.endswith(f".{host}"):
+                return host
+
+        return hostname
@@ -0,0 +1,169 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import gzip
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+
+from meeting_html_parser import MeetingHTMLParser
+
+logger = logging.getLogger("unsc_db_filler")
+
+
+def parse(content: bytes) -> list:
+    """
+    Parses a UNSC meeting table page. A module level function, so a process pool can run it.
+
+    :param content: the downloaded page
+    :return: a list of records, see `MeetingHTMLParser.extract_records`
+    """
+    return MeetingHTMLParser(content.decode("utf-8")).extract_records()
+
+
+class RecordCache:
+    """
+    This class keeps the records `MeetingHTMLParser` extracted from the UNSC meeting table pages,
+    so we don't need to parse the pages again on every run.
+
+    For every page, the cache holds the sha256 hash of the page, the version of the parser,
+    and the records. They are only used as long as both the page and the parser did not change.
+
+    `records_of` parses the pages which are not in the cache in a process pool, and hands out the records
+    of each page as soon as it is parsed.
+
+    The cache is a single gzip compressed JSON file. Call `save` after reading the pages, to write it
+    (only when something changed).
+    """
+
+    def __init__(self, cache_file: str) -> None:
+        self.cache_file: str = cache_file
+        self.entries: dict = self.read_cache()
+        self.changed: bool = False
+
+    def records(self, html_file: str) -> list:
+        """
+        Returns the records of a UNSC meeting table page, from the cache if the page was parsed before.
+
+        :param html_file: the path to the downloaded page
+        :return: a list of records, see `MeetingHTMLParser.extract_records`
+        """
+        content, sha256 = self.read_page(html_file)
+
+        entry = self.entries.get(html_file)
+        if not self.is_fresh(entry, sha256):
+            logger.info("Parsing meeting table '%s'", html_file)
+            entry = self.store(html_file, sha256, parse(content))
+
+        return self.copy(entry)
+
+    def records_of(self, html_files: list, processes: int = None):
+        """
+        Yields the records of the UNSC meeting table pages, as soon as they are available:
+        first the ones in the cache, then the others while a process pool parses them, in the order they finish.
+        A page which can't be read or parsed is logged and skipped.
+
+        :param html_files: the paths to the downloaded pages
+        :param processes: the amount of processes parsing pages (defaults to the amount of CPU cores)
+        :return: a generator of (html_file, records) tuples
+        """
+        stale = {}
+        for html_file in html_files:
+            try:
+                content, sha256 = self.read_page(html_file)
+            except OSError as e:
+                logger.error("Failed reading html page '%s': %s", html_file, e)
+                continue
+
+            entry = self.entries.get(html_file)
+            if self.is_fresh(entry, sha256):
+                yield html_file, self.copy(entry)
+            else:
+                stale[html_file] = (content, sha256)
+
+        if len(stale) == 0:
+            return
+
+        logger.info("Parsing %s meeting tables", len(stale))
+        # Spawned, not forked: the pages are parsed while other threads are running, see `PDFTextExtractor`
+        with ProcessPoolExecutor(
+            max_workers=min(processes or os.cpu_count(), len(stale)),
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as executor:
+            futures = {
+                executor.submit(parse, content): (html_file, sha256)
+                for html_file, (content, sha256) in stale.items()
+            }
+            for future in as_completed(futures):
+                html_file, sha256 = futures[future]
+                try:
+                    entry = self.store(html_file, sha256, future.result())
+                except Exception as e:
+                    logger.error("Failed parsing html page '%s': %s", html_file, e)
+                    continue
+
+                yield html_file, self.copy(entry)
+
+    @staticmethod
+    def read_page(html_file: str) -> tuple:
+        """
+        :return: the content of a downloaded page, and its sha256 hash
+        """
+        with open(html_file, "rb") as f:
+            content = f.read()
+        return content, hashlib.sha256(content).hexdigest()
+
+    @staticmethod
+    def is_fresh(entry: dict, sha256: str) -> bool:
+        """
+        :return: True if the cache entry is for the page as it is now, parsed by the current parser
+        """
+        return (
+            entry is not None
+            and entry["sha256"] == sha256
+            and entry["version"] == MeetingHTMLParser.VERSION
+        )
+
+    def store(self, html_file: str, sha256: str, records: list) -> dict:
+        entry = {
+            "sha256": sha256,
+            "version": MeetingHTMLParser.VERSION,
+            "records": records,
+        }
+        self.entries[html_file] = entry
+        self.changed = True
+        return entry
+
+    @staticmethod
+    def copy(entry: dict) -> list:
+        # Callers add to the records, keep ours as they are
+        return [dict(record) for record in entry["records"]]
+
+    def read_cache(self) -> dict:
+        """
+        :return: the entries of the cache file, or nothing if there is no (readable) cache file
+        """
+        if not os.path.exists(self.cache_file):
+            return {}
+
+        try:
+            with gzip.open(self.cache_file, "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, EOFError, ValueError) as e:
+            logger.info("Ignoring unreadable record cache '%s': %s", self.cache_file, e)
+            return {}
+
+    def save(self) -> None:
+        """
+        Writes the cache file, if any page was parsed (again).
+        We write to a temporary file first, so a crash never leaves half a cache behind.
+        """
+        if not self.changed:
+            return
+
+        tmp_file = f"{self.cache_file}.tmp"
+        with gzip.open(tmp_file, "wt", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_file, self.cache_file)
+        self.changed = False
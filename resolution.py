@@ -4,6 +4,7 @@ from typing import List
 
 from dbconnection import Base
 from meeting import Meeting
+from resolution_text import ResolutionText
 
 
 class Resolution(Base):
@@ -14,6 +15,8 @@ class Resolution(Base):
     This can become an adopted resolution in the form of S/RES/YYYY.
     A draft resolution can also be vetoed by a permanent members, not becoming adopted.
 
+    The texts of the draft and adopted resolution are kept in the `resolution_text` table.
+    They are only read from the DB when `draft_text` or `final_text` is used.
     """
 
     DRAFT = False
@@ -24,17 +27,17 @@ class Resolution(Base):
 
     id = Column(Integer, primary_key=True)
     draft_id = Column(String)
-    final_id = Column(String)
+    final_id = Column(String, index=True)
     draft_url = Column(String)
     final_url = Column(String)
-    status = Column(String)
-    draft_text = Column(String)
-    final_text = Column(String)
-    year = Column(Integer)
-    meeting_id = Column(String, ForeignKey("meeting.meeting_id"))
+    status = Column(String, index=True)
+    year = Column(Integer, index=True)
+    meeting_id = Column(String, ForeignKey("meeting.meeting_id"), index=True)
 
     meeting = relationship("Meeting", back_populates="resolution")
     state = relationship("State", secondary="vetocasts")
+    # Loaded on first use only
+    text = relationship("ResolutionText", uselist=False, lazy="select")
 
     def __init__(
         self,
@@ -59,8 +62,7 @@ class Resolution(Base):
             if self.final_id is not None
             else None
         )
-        self.draft_text: str = ""
-        self.final_text: str = ""
+        self.text = ResolutionText(self.draft_id)
         self.meeting = meeting
         self.year: int = year
 
@@ -72,11 +74,19 @@ class Resolution(Base):
         else:
             self.status = "not adopted"
 
+    @property
+    def draft_text(self) -> str:
+        return self.text.draft if self.text is not None else None
+
+    @property
+    def final_text(self) -> str:
+        return self.text.final if self.text is not None else None
+
     def add_draft_text(self, text: str) -> None:
-        self.draft_text = text
+        self.text.draft = text
 
     def add_final_text(self, text: str) -> None:
-        self.final_text = text
+        self.text.final = text
 
     def __repr__(self) -> str:
         return f"draft: {self.draft_id} -- final: {self.final_id} -- vetoed: {self.vetoed} -- meeting: {self.meeting_id}"
@@ -0,0 +1,195 @@
+import hashlib
+import json
+import logging
+import os
+import re
+
+import openpyxl
+
+logger = logging.getLogger("unsc_db_filler")
+
+
+class ResolutionIndex:
+    """
+    This class maps adopted resolutions (`S/RES/XXXX (YYYY)`) to their original draft resolution.
+    It is built from the UN Library Excel export (see README.md, you need `file1.xlsx`).
+
+    Scanning the Excel sheet cell by cell for every adopted resolution is slow. Instead, we read the workbook
+    once and build two lookup tables:
+     - an exact one: `S/RES/2498(2019)` -> `S/2019/xxx`
+     - a year-stripped one: `S/RES/2498` -> `S/2019/xxx`
+
+    Both tables are persisted to a sidecar cache file next to the Excel export. That cache is only
+    trusted as long as the Excel export's modification time and sha256 hash did not change.
+
+    Once loaded, the index is read-only, so it can safely be shared across worker threads.
+    """
+
+    # Bump this when the structure of the cache file changes
+    CACHE_VERSION = 1
+
+    # At the moment the adopted resolution is at column J, and the original one at column B.
+    # However..you never know what they might change later again,
+    # so let's just search across 26 columns at least... .
+    COLUMNS_TO_SEARCH = 26
+    DRAFT_COLUMN = 1  # Column B
+
+    def __init__(self, excel_file: str, cache_file: str = None) -> None:
+        self.excel_file: str = excel_file
+        self.cache_file: str = (
+            cache_file if cache_file is not None else f"{excel_file}.index.json"
+        )
+        self.exact: dict = {}
+        self.partial: dict = {}
+
+    def load(self) -> "ResolutionIndex":
+        """
+        Loads the index from the sidecar cache if it's still valid,
+        else (re)builds it from the Excel export and refreshes the cache.
+
+        :return: the loaded index itself
+        """
+        mtime = os.path.getmtime(self.excel_file)
+        sha256 = self.hash_file(self.excel_file)
+
+        if self.read_cache(mtime, sha256):
+            logger.info(
+                "Loaded resolution index from cache '%s' (%s resolutions)",
+                self.cache_file,
+                len(self.exact),
+            )
+            return self
+
+        self.build()
+        self.write_cache(mtime, sha256)
+
+        return self
+
+    def build(self) -> None:
+        """
+        Reads the Excel export once, in streaming read-only mode, and fills the lookup tables.
+        If the same resolution shows up multiple times, the first row wins. That is
+        the same result a top-down scan of the sheet would give.
+        """
+        logger.info("Building resolution index from '%s' - BEGIN", self.excel_file)
+        self.exact = {}
+        self.partial = {}
+
+        book = openpyxl.load_workbook(self.excel_file, read_only=True)
+        try:
+            sheet = book["results"]
+            for row in sheet.iter_rows(max_col=self.COLUMNS_TO_SEARCH, values_only=True):
+                if len(row) <= self.DRAFT_COLUMN:
+                    continue
+
+                draft = row[self.DRAFT_COLUMN]
+                for value in row:
+                    if value is None:
+                        continue
+
+                    if isinstance(value, str):
+                        self.exact.setdefault(value, draft)
+
+                    # Example S/RES/2498(2019) shows in the Excel sheet as S/RES/2498(2018).
+                    # The year is wrong! We also index every value without its `(YYYY)` suffix.
+                    value = str(value)
+                    if "(" in value:
+                        self.partial.setdefault(value[: value.index("(")], draft)
+        finally:
+            book.close()
+
+        logger.info(
+            "Building resolution index from '%s' - END (%s resolutions)",
+            self.excel_file,
+            len(self.exact),
+        )
+
+    def find_draft(self, resolution: str) -> str:
+        """
+        Given an accepted resolution `S/RES/XXXXX`, what is the original draft resolution?
+
+        :param resolution: the final accepted resolution ID
+        :return: the original draft resolution ID, or "UNKNOWN" if we can't find it
+        """
+        if resolution in self.exact:
+            return self.exact[resolution]
+
+        # The adopted resolution wasn't found through exact matching.
+        # Let's try to get rid of the year suffix and do some partial matching...
+        resolution = re.sub(r"\(.*\)", "", resolution)
+        logger.info("Searching for '%s(' in the resolution index (partial matching)...", resolution)
+        if resolution in self.partial:
+            return self.partial[resolution]
+
+        # If we got here, something is wrong with our original data...
+        return "UNKNOWN"
+
+    def read_cache(self, mtime: float, sha256: str) -> bool:
+        """
+        Reads the sidecar cache file, if it exists and still matches the Excel export.
+
+        :param mtime: the current modification time of the Excel export
+        :param sha256: the current sha256 hash of the Excel export
+        :return: True if the index was loaded from the cache, False otherwise
+        """
+        if not os.path.exists(self.cache_file):
+            return False
+
+        try:
+            with open(self.cache_file, "r") as f:
+                cache = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.info("Ignoring unreadable resolution index cache '%s': %s", self.cache_file, e)
+            return False
+
+        if (
+            cache.get("version") != self.CACHE_VERSION
+            or cache.get("mtime") != mtime
+            or cache.get("sha256") != sha256
+        ):
+            logger.info("Resolution index cache '%s' is outdated", self.cache_file)
+            return False
+
+        self.exact = cache["exact"]
+        self.partial = cache["partial"]
+        return True
+
+    def write_cache(self, mtime: float, sha256: str) -> None:
+        """
+        Writes the lookup tables to the sidecar cache file.
+        We write to a temporary file first, so a crash never leaves a half written cache behind.
+
+        :param mtime: the modification time of the Excel export the index was built from
+        :param sha256: the sha256 hash of the Excel export the index was built from
+        """
+        cache = {
+            "version": self.CACHE_VERSION,
+            "mtime": mtime,
+            "sha256": sha256,
+            "exact": self.exact,
+            "partial": self.partial,
+        }
+
+        tmp_file = f"{self.cache_file}.tmp"
+        try:
+            with open(tmp_file, "w") as f:
+                json.dump(cache, f)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as e:
+            # Not being able to cache is not fatal, we'll just rebuild next time.
+            logger.info("Unable to write resolution index cache '%s': %s", self.cache_file, e)
+
+    @staticmethod
+    def hash_file(file: str) -> str:
+        """
+        Calculates the sha256 hash of a given file
+
+        :param file: the path to the file
+        :return: the hex digest of the file's sha256 hash
+        """
+        sha256 = hashlib.sha256()
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(chunk)
+
+        return sha256.hexdigest()
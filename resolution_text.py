@@ -0,0 +1,56 @@
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
+from sqlalchemy import Column, String, LargeBinary, ForeignKey, Index
+
+from dbconnection import Base
+from text_codec import TextCodec
+
+
+class ResolutionText(Base):
+    """
+    Holds the texts of a UN Resolution: the text of its draft, and of its adopted version.
+
+    Like the meeting transcripts, they are kept in a table of their own,
+    so reading the resolutions themselves stays small and fast.
+
+    Depending on the text storage mode (see `TextCodec`), the texts are stored as plain text
+    or compressed (the *_compressed columns). Use `draft` and `final` to read or write them either way.
+
+    The *_tsv columns hold the words of the texts, for full text search (see `TextSearch`).
+    The `BulkWriter` fills them in when writing the texts.
+    """
+
+    __tablename__ = "resolution_text"
+    __table_args__ = (
+        Index("resolution_text_draft_text_tsv_idx", "draft_text_tsv", postgresql_using="gin"),
+        Index("resolution_text_final_text_tsv_idx", "final_text_tsv", postgresql_using="gin"),
+    )
+
+    draft_id = Column(String, ForeignKey("resolution.draft_id"), primary_key=True)
+    draft_text = Column(String)
+    final_text = Column(String)
+    draft_text_compressed = Column(LargeBinary)
+    final_text_compressed = Column(LargeBinary)
+    draft_text_tsv = deferred(Column(TSVECTOR))
+    final_text_tsv = deferred(Column(TSVECTOR))
+
+    def __init__(self, draft_id: str, draft_text: str = "", final_text: str = "") -> None:
+        self.draft_id = draft_id
+        self.draft = draft_text
+        self.final = final_text
+
+    @property
+    def draft(self) -> str:
+        return TextCodec.decode(self.draft_text, self.draft_text_compressed)
+
+    @draft.setter
+    def draft(self, text: str) -> None:
+        self.draft_text, self.draft_text_compressed = TextCodec.shared().encode(text)
+
+    @property
+    def final(self) -> str:
+        return TextCodec.decode(self.final_text, self.final_text_compressed)
+
+    @final.setter
+    def final(self, text: str) -> None:
+        self.final_text, self.final_text_compressed = TextCodec.shared().encode(text)
@@ -0,0 +1,156 @@
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger("unsc_db_filler")
+
+# What kind of error made a job fail, which decides how often and how soon we retry it:
+#  transient: the server or network had a hiccup, retrying soon will likely work
+#  not yet published: the UN did not publish the document yet (translations can take days), retry rarely
+#  permanent: retrying won't help
+TRANSIENT = "transient"
+NOT_YET_PUBLISHED = "not-yet-published"
+PERMANENT = "permanent"
+
+
+def classify(error: Exception) -> str:
+    """
+    Errors can tell what kind of error they are with an `error_class` attribute.
+    All other errors are considered transient.
+
+    :param error: the error a job failed with
+    :return: the class of the error
+    """
+    return getattr(error, "error_class", TRANSIENT)
+
+
+def classify_status(status_code: int) -> str:
+    """
+    :param status_code: the HTTP status code of a failed download
+    :return: the class of the error
+    """
+    if status_code in (400, 404, 410):
+        return PERMANENT
+
+    return TRANSIENT
+
+
+class RetryPolicy:
+    """
+    This class decides whether, and when, a failed job is retried.
+
+    Every class of error (see `classify`) has its own budget of attempts, and its own backoff:
+    the delay before a retry doubles with every attempt (up to a maximum), and is randomized between
+    half and all of it, so jobs which failed together don't all come back at the same moment.
+    """
+
+    def __init__(self, retries: int = 20) -> None:
+        self.retries: int = retries
+        # The maximum amount of attempts of a job, when its last error is of the class
+        self.attempts: dict = {
+            TRANSIENT: retries,
+            NOT_YET_PUBLISHED: min(retries, 4),
+            PERMANENT: 1,
+        }
+        # The delay in seconds before the first retry, and the maximum delay
+        self.delays: dict = {
+            TRANSIENT: (1, 120),
+            NOT_YET_PUBLISHED: (60, 600),
+            PERMANENT: (0, 0),
+        }
+
+    def should_retry(self, attempts: int, error_class: str) -> bool:
+        """
+        :param attempts: the amount of times the job was tried, including the next try
+        :param error_class: the class of the error the job failed with
+        :return: True if the job can be tried again
+        """
+        return attempts <= self.attempts[error_class]
+
+    def delay(self, attempts: int, error_class: str) -> float:
+        """
+        :param attempts: the amount of times the job was tried, including the next try
+        :param error_class: the class of the error the job failed with
+        :return: the amount of seconds to wait before trying the job again
+        """
+        base, maximum = self.delays[error_class]
+        delay = min(maximum, base * 2 ** max(0, attempts - 2))
+
+        return random.uniform(delay / 2, delay)
+
+
+class CircuitBreaker:
+    """
+    This class pauses all jobs for a host while that host seems to be down.
+
+    After `threshold` transient failures in a row for a host, the circuit for that host opens:
+    no jobs for it are taken from the queue for `cooldown` seconds. After that, jobs are let through again.
+    The first success closes the circuit, another failure opens it again.
+
+    Hosts are keyed without their `www.` prefix, so e.g. `www.undocs.org` and `undocs.org` share a circuit.
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 60) -> None:
+        self.threshold: int = threshold
+        self.cooldown: float = cooldown
+        self.failures: dict = {}
+        self.open_until: dict = {}
+        self.lock: threading.Lock = threading.Lock()
+
+    @staticmethod
+    def key(host: str) -> str:
+        """
+        :param host: the host a job talks to
+        :return: the host the circuit of the job is kept for
+        """
+        host = host.lower()
+        return host[len("www."):] if host.startswith("www.") else host
+
+    def allows(self, host: str) -> bool:
+        """
+        :param host: the host a job talks to, or None
+        :return: True if jobs for the host can be processed now
+        """
+        if host is None:
+            return True
+
+        with self.lock:
+            return self.open_until.get(self.key(host), 0) <= time.time()
+
+    def reopens_at(self, host: str) -> float:
+        """
+        :param host: the host a job talks to, or None
+        :return: the time at which jobs for the host can be processed again (0 if they can now)
+        """
+        if host is None:
+            return 0
+
+        with self.lock:
+            return self.open_until.get(self.key(host), 0)
+
+    def record(self, host: str, error_class: str = None) -> None:
+        """
+        Records the result of a job for a host
+
+        :param host: the host the job talked to, or None
+        :param error_class: the class of the error the job failed with, or None if it succeeded
+        """
+        if host is None:
+            return
+
+        host = self.key(host)
+        with self.lock:
+            if error_class is None:
+                self.failures.pop(host, None)
+                self.open_until.pop(host, None)
+            elif error_class == TRANSIENT:
+                self.failures[host] = self.failures.get(host, 0) + 1
+                if self.failures[host] >= self.threshold:
+                    logger.info(
+                        "%s failures in a row for '%s', pausing its jobs for %s seconds",
+                        self.failures[host],
+                        host,
+                        self.cooldown,
+                    )
+                    self.open_until[host] = time.time() + self.cooldown
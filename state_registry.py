@@ -0,0 +1,74 @@
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Engine
+from types import MappingProxyType
+
+import logging
+
+from retry_policy import PERMANENT
+from state import State
+from veto_html_parser import VetoHTMLParser
+
+logger = logging.getLogger("unsc_db_filler")
+
+
+class UnknownState(Exception):
+    # Retrying won't make a state known, see `retry_policy.classify`
+    error_class = PERMANENT
+
+
+class StateRegistry:
+    """
+    This class makes sure the state table in the DB holds the permanent UNSC members,
+    and knows the `state_id` of each of them.
+
+    The states are written once at startup. After that, looking up a `state_id` needs no database
+    reads at all. The name to `state_id` mapping is read-only, so it can be shared by all workers.
+
+    If ever additional P5 members are added, `P5_MEMBER_STATES` needs to be updated.
+    """
+
+    P5_MEMBER_STATES = ["USA", "UK", "France", "China", "Russia"]
+
+    def __init__(self, engine: Engine) -> None:
+        self.engine: Engine = engine
+        self.state_ids: MappingProxyType = MappingProxyType({})
+
+    def load(self) -> "StateRegistry":
+        """
+        Inserts the P5 member states which are not in the DB yet, and reads back all their ids.
+
+        :return: the loaded registry itself
+        """
+        with self.engine.begin() as connection:
+            connection.execute(
+                insert(State.__table__)
+                .values([{"name": state} for state in self.P5_MEMBER_STATES])
+                .on_conflict_do_nothing(index_elements=["name"])
+            )
+            rows = connection.execute(select(State.name, State.state_id)).all()
+
+        state_ids = {name: state_id for name, state_id in rows}
+
+        # The veto table also uses other names for some of the states, know those too.
+        for alias, name in VetoHTMLParser.NORMALIZATION_TABLE.items():
+            if name in state_ids:
+                state_ids[alias] = state_ids[name]
+
+        self.state_ids = MappingProxyType(state_ids)
+        logger.info("Loaded %s states from the DB", len(rows))
+
+        return self
+
+    def get_state_id(self, name: str) -> int:
+        """
+        Returns the `state_id` of a given state
+
+        :param name: the name of the state, as it's used in the DB or in the veto table
+        :return: the `state_id` of the state
+        """
+        state_id = self.state_ids.get(name.strip())
+        if state_id is None:
+            raise UnknownState(f"State '{name}' is not known in the state table")
+
+        return state_id
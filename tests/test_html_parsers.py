@@ -0,0 +1,50 @@
+"""
+Checks that the lxml and html5lib backends of the HTML parsers give exactly the same result
+for every downloaded UNSC meeting table page, and the veto table.
+"""
+import glob
+import os
+
+import pytest
+
+from meeting_html_parser import MeetingHTMLParser
+from veto_html_parser import VetoHTMLParser
+
+SCRATCH_FOLDER = os.path.join(os.path.dirname(__file__), "..", "UNDataScraping", "scratch")
+VETO_TABLE = "scact_veto_table_en.html"
+
+MEETING_TABLES = sorted(
+    os.path.basename(file)
+    for file in glob.glob(f"{SCRATCH_FOLDER}/scact*_table_en.html")
+    if os.path.basename(file) != VETO_TABLE
+)
+
+
+def read_from_scratch(filename: str) -> str:
+    with open(os.path.join(SCRATCH_FOLDER, filename), "r") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("filename", MEETING_TABLES)
+def test_meeting_html_parsers_give_the_same_records(filename):
+    html = read_from_scratch(filename)
+
+    lxml_records = MeetingHTMLParser(html, backend=MeetingHTMLParser.LXML).extract_records()
+    html5lib_records = MeetingHTMLParser(html, backend=MeetingHTMLParser.HTML5LIB).extract_records()
+
+    assert len(lxml_records) > 0
+    assert lxml_records == html5lib_records
+
+
+def test_veto_html_parsers_give_the_same_mapping():
+    html = read_from_scratch(VETO_TABLE)
+
+    lxml_mapping = VetoHTMLParser(
+        html, backend=VetoHTMLParser.LXML
+    ).create_resolution_to_veto_mapping_table()
+    html5lib_mapping = VetoHTMLParser(
+        html, backend=VetoHTMLParser.HTML5LIB
+    ).create_resolution_to_veto_mapping_table()
+
+    assert len(lxml_mapping) > 0
+    assert list(lxml_mapping.items()) == list(html5lib_mapping.items())
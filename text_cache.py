@@ -0,0 +1,60 @@
+import gzip
+import logging
+import os
+import threading
+
+logger = logging.getLogger("unsc_db_filler")
+
+
+class TextCache:
+    """
+    This class stores the text extracted from PDFs, so we don't need to extract it again on the next run.
+
+    The text is stored gzip compressed, in a file named after the sha256 hash of the PDF content and the version
+    of the extractor which extracted it:
+
+        <folder>/<first 2 characters of the hash>/<hash>-<version>.txt.gz
+
+    When the PDF changes, or the extractor changes (and with it its version), the text is extracted again.
+    """
+
+    def __init__(self, folder: str, version: str) -> None:
+        self.folder: str = folder
+        self.version: str = version
+
+    def path(self, sha256: str) -> str:
+        return f"{self.folder}/{sha256[:2]}/{sha256}-{self.version}.txt.gz"
+
+    def get(self, sha256: str) -> str:
+        """
+        Returns the cached text of a PDF
+
+        :param sha256: the sha256 hash of the PDF content
+        :return: the extracted text, or None if it's not in the cache
+        """
+        path = self.path(sha256)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                return f.read()
+        except (OSError, EOFError) as e:
+            logger.info("Ignoring unreadable cached text '%s': %s", path, e)
+            return None
+
+    def put(self, sha256: str, text: str) -> None:
+        """
+        Stores the extracted text of a PDF.
+        We write to a temporary file first, so a crash never leaves half a text behind.
+
+        :param sha256: the sha256 hash of the PDF content
+        :param text: the extracted text
+        """
+        path = self.path(sha256)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp_file = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with gzip.open(tmp_file, "wt", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_file, path)
@@ -0,0 +1,120 @@
+import gzip
+import threading
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# The ways to store the texts of meetings and resolutions
+PLAIN = "plain"
+GZIP = "gzip"
+ZSTD = "zstd"
+MODES = [PLAIN, GZIP, ZSTD]
+
+
+class TextCodec:
+    """
+    This class compresses the meeting transcripts and resolution texts before they are stored, and decompresses
+    them again when they are read. Every text has two columns: one for the plain text, and one for the compressed
+    text. Depending on the mode, only one of them is filled in.
+
+    Compressed texts start with the magic bytes of their format, so they can be read whatever mode is used now.
+    That way, a database can hold plain, gzip and zstd compressed texts at the same time.
+
+    `Meeting`, `Resolution` and the `BulkWriter` use the shared codec (see `shared`), which stores plain text
+    unless told otherwise with `use`.
+    """
+
+    _GZIP_MAGIC = b"\x1f\x8b"
+    _ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, mode: str = PLAIN, level: int = None) -> None:
+        if mode not in MODES:
+            raise ValueError(f"Unknown text storage mode '{mode}', use one of {MODES}")
+        if mode == ZSTD and zstandard is None:
+            raise ValueError("The zstd text storage mode needs the 'zstandard' package")
+
+        self.mode: str = mode
+        self.level: int = level
+
+    @classmethod
+    def shared(cls) -> "TextCodec":
+        """
+        :return: the codec used to store all texts
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @classmethod
+    def use(cls, mode: str, level: int = None) -> "TextCodec":
+        """
+        Changes how all texts are stored from now on.
+
+        :param mode: PLAIN, GZIP or ZSTD
+        :param level: the compression level, or None for the default of the format
+        :return: the new shared codec
+        """
+        with cls._shared_lock:
+            cls._shared = cls(mode, level)
+            return cls._shared
+
+    def encode(self, text: str) -> tuple:
+        """
+        :param text: the text to store
+        :return: the values of the plain and the compressed column for the text
+        """
+        if text is None or self.mode == PLAIN:
+            return text, None
+
+        return None, self.compress(text)
+
+    def compress(self, text: str) -> bytes:
+        data = text.encode("utf-8")
+        if self.mode == ZSTD:
+            level = self.level if self.level is not None else 3
+            return zstandard.ZstdCompressor(level=level).compress(data)
+
+        # No timestamp in the header, so the same text always compresses to the same bytes
+        level = self.level if self.level is not None else 6
+        return gzip.compress(data, compresslevel=level, mtime=0)
+
+    @classmethod
+    def decode(cls, plain: str, compressed: bytes) -> str:
+        """
+        :param plain: the value of the plain column of a text
+        :param compressed: the value of the compressed column of a text
+        :return: the text, whichever way it is stored
+        """
+        if compressed is None:
+            return plain
+
+        return cls.decompress(compressed)
+
+    @classmethod
+    def mode_of(cls, plain: str, compressed: bytes) -> str:
+        """
+        :return: the mode a text is stored in: PLAIN, GZIP or ZSTD
+        """
+        if compressed is None:
+            return PLAIN
+
+        return ZSTD if bytes(compressed[:4]) == cls._ZSTD_MAGIC else GZIP
+
+    @classmethod
+    def decompress(cls, data: bytes) -> str:
+        data = bytes(data)
+        if data.startswith(cls._ZSTD_MAGIC):
+            if zstandard is None:
+                raise ValueError("Reading a zstd compressed text needs the 'zstandard' package")
+            return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+
+        if data.startswith(cls._GZIP_MAGIC):
+            return gzip.decompress(data).decode("utf-8")
+
+        raise ValueError("Unknown compression format of a stored text")
@@ -0,0 +1,225 @@
+from typing import NamedTuple
+
+from sqlalchemy import String, func, literal, null, select, union_all
+from sqlalchemy.engine import Engine
+
+from meeting import Meeting
+from meeting_transcript import MeetingTranscript
+from resolution import Resolution
+from resolution_text import ResolutionText
+from text_codec import TextCodec
+
+# The PostgreSQL text search configuration of the texts, they are all in English
+CONFIGURATION = "english"
+# Only the start of a text is indexed. A tsvector is limited to 1 MB, which a very long transcript could exceed,
+# and word positions stop counting at 16383, which English text reaches after about this many characters.
+# It also keeps the texts we send to the server for indexing small, when they are stored compressed.
+MAX_INDEXED_CHARACTERS = 100_000
+# How ts_headline cuts the snippets out of a text
+HEADLINE_OPTIONS = "MaxFragments=2, MinWords=10, MaxWords=25, FragmentDelimiter=' ... '"
+
+# Which text matched the query
+MEETING = "meeting"
+DRAFT = "draft"
+FINAL = "final"
+KINDS = [MEETING, DRAFT, FINAL]
+
+
+def to_tsvector(text: str):
+    """
+    :param text: a meeting transcript or resolution text
+    :return: the SQL expression for the words of the text, to fill in the *_tsv columns with.
+             Only the first `MAX_INDEXED_CHARACTERS` characters of the text are indexed.
+    """
+    return func.to_tsvector(CONFIGURATION, text[:MAX_INDEXED_CHARACTERS] if text is not None else "")
+
+
+class SearchResult(NamedTuple):
+    # MEETING, DRAFT or FINAL: which text matched the query
+    kind: str
+    meeting_id: str
+    # The resolution, None for meetings
+    draft_id: str
+    final_id: str
+    status: str
+    year: int
+    # How well the text matches the query, higher is better
+    rank: float
+    # The parts of the text which match the query
+    snippet: str = None
+
+
+class TextSearch:
+    """
+    This class searches the meeting transcripts and the draft and adopted resolution texts in the DB,
+    with the full text search of PostgreSQL. Every text has a tsvector column with a GIN index, so a search
+    only reads the texts which match, and only the best matches are read to cut snippets from. E.g.:
+
+        for result in TextSearch(engine).search("Bosnia", year_range=(1994, 1999), status="vetoed"):
+            print(result.kind, result.meeting_id, result.draft_id, result.rank, result.snippet)
+
+    The query is searched for like `plainto_tsquery` does: all words have to be in the text,
+    and words match whatever form they are in (e.g. "sanction" matches "sanctions").
+    Only the first `MAX_INDEXED_CHARACTERS` characters of every text are searched.
+    """
+
+    def __init__(self, engine: Engine) -> None:
+        self.engine: Engine = engine
+
+    def search(
+        self,
+        query: str,
+        year_range: tuple = None,
+        status: str = None,
+        kinds: list = None,
+        limit: int = 20,
+        snippets: bool = True,
+    ) -> list:
+        """
+        Searches the texts, and returns the best matches.
+
+        :param query: the words to search for
+        :param year_range: the first and the last year (both included) to search, or None for all years
+        :param status: only search the resolutions with this status ('adopted', 'not adopted' or 'vetoed'),
+                       and the meetings which discussed one. None for all of them
+        :param kinds: which texts to search: MEETING, DRAFT and/or FINAL. None for all of them
+        :param limit: the maximum amount of results
+        :param snippets: cut a snippet out of the text of every result
+        :return: a list of SearchResults, the best match first
+        """
+        tsquery = func.plainto_tsquery(CONFIGURATION, query)
+        kinds = kinds if kinds is not None else KINDS
+
+        selects = []
+        if MEETING in kinds:
+            selects.append(self.meetings(tsquery, year_range, status))
+        if DRAFT in kinds:
+            selects.append(
+                self.resolutions(DRAFT, ResolutionText.draft_text_tsv, tsquery, year_range, status)
+            )
+        if FINAL in kinds:
+            selects.append(
+                self.resolutions(FINAL, ResolutionText.final_text_tsv, tsquery, year_range, status)
+            )
+        if len(selects) == 0:
+            return []
+
+        ranked = union_all(*selects).subquery()
+        statement = select(ranked).order_by(ranked.c.rank.desc()).limit(limit)
+
+        with self.engine.connect() as connection:
+            results = [SearchResult(*row) for row in connection.execute(statement)]
+
+            if snippets:
+                results = self.add_snippets(connection, results, tsquery)
+
+        return results
+
+    @staticmethod
+    def meetings(tsquery, year_range: tuple, status: str):
+        statement = (
+            select(
+                literal(MEETING).label("kind"),
+                Meeting.meeting_id,
+                null().cast(String).label("draft_id"),
+                null().cast(String).label("final_id"),
+                null().cast(String).label("status"),
+                Meeting.year,
+                func.ts_rank_cd(MeetingTranscript.full_text_tsv, tsquery).label("rank"),
+            )
+            .join(Meeting, Meeting.meeting_id == MeetingTranscript.meeting_id)
+            .where(MeetingTranscript.full_text_tsv.op("@@")(tsquery))
+        )
+
+        if year_range is not None:
+            statement = statement.where(Meeting.year.between(*year_range))
+        if status is not None:
+            statement = statement.where(
+                Meeting.meeting_id.in_(
+                    select(Resolution.meeting_id).where(Resolution.status == status)
+                )
+            )
+
+        return statement
+
+    @staticmethod
+    def resolutions(kind: str, tsv_column, tsquery, year_range: tuple, status: str):
+        statement = (
+            select(
+                literal(kind).label("kind"),
+                Resolution.meeting_id,
+                Resolution.draft_id,
+                Resolution.final_id,
+                Resolution.status,
+                Resolution.year,
+                func.ts_rank_cd(tsv_column, tsquery).label("rank"),
+            )
+            .join(Resolution, Resolution.draft_id == ResolutionText.draft_id)
+            .where(tsv_column.op("@@")(tsquery))
+        )
+
+        if year_range is not None:
+            statement = statement.where(Resolution.year.between(*year_range))
+        if status is not None:
+            statement = statement.where(Resolution.status == status)
+
+        return statement
+
+    @staticmethod
+    def add_snippets(connection, results: list, tsquery) -> list:
+        """
+        Cuts the snippets out of the texts of the results, with ts_headline.
+        Plain texts are cut on the server, compressed texts are decompressed here and sent along.
+        """
+        # For every kind: the id column, the plain and the compressed text column, and the id of a result
+        columns = {
+            MEETING: (
+                MeetingTranscript.meeting_id,
+                MeetingTranscript.full_text,
+                MeetingTranscript.full_text_compressed,
+                lambda result: result.meeting_id,
+            ),
+            DRAFT: (
+                ResolutionText.draft_id,
+                ResolutionText.draft_text,
+                ResolutionText.draft_text_compressed,
+                lambda result: result.draft_id,
+            ),
+            FINAL: (
+                ResolutionText.draft_id,
+                ResolutionText.final_text,
+                ResolutionText.final_text_compressed,
+                lambda result: result.draft_id,
+            ),
+        }
+
+        snippets = {}
+        for kind, (id_column, text_column, compressed_column, id_of) in columns.items():
+            ids = [id_of(result) for result in results if result.kind == kind]
+            if len(ids) == 0:
+                continue
+
+            statement = select(
+                id_column,
+                func.ts_headline(CONFIGURATION, text_column, tsquery, HEADLINE_OPTIONS),
+                compressed_column,
+            ).where(id_column.in_(ids))
+
+            for id, snippet, compressed in connection.execute(statement):
+                if compressed is not None:
+                    snippet = connection.execute(
+                        select(
+                            func.ts_headline(
+                                CONFIGURATION,
+                                TextCodec.decompress(compressed),
+                                tsquery,
+                                HEADLINE_OPTIONS,
+                            )
+                        )
+                    ).scalar()
+                snippets[(kind, id)] = snippet
+
+        return [
+            result._replace(snippet=snippets.get((result.kind, columns[result.kind][3](result))))
+            for result in results
+        ]
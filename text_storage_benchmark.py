@@ -0,0 +1,133 @@
+"""
+Compares the text storage modes (see `TextCodec`) on the meeting transcripts and resolution texts:
+how much space the texts take, and how long it takes to compress them, and to read them back.
+
+By default it uses the texts extracted from the downloaded PDFs (the PDF text cache), so it needs no database:
+
+    $ python text_storage_benchmark.py
+
+With --from-db it uses the texts in the database instead, and also shows how much space the text tables take
+and how long reading all transcripts takes, in the mode they are stored in now:
+
+    $ python text_storage_benchmark.py --from-db
+"""
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+import argparse
+import glob
+import gzip
+import os
+import time
+
+from dbconnection import DBConnection
+from text_codec import TextCodec, MODES, ZSTD, zstandard
+from text_store import TextStore
+
+TEXT_CACHE_FOLDER = "UNDataScraping/scratch/pdf_text_cache"
+TEXT_TABLES = ["meeting_transcript", "resolution_text"]
+
+
+def read_text_cache(folder: str) -> list:
+    texts = []
+    for file in sorted(glob.glob(f"{folder}/*/*.txt.gz")):
+        with gzip.open(file, "rt", encoding="utf-8") as f:
+            texts.append(f.read())
+    return texts
+
+
+def connect():
+    load_dotenv("Database/database.env")
+    return DBConnection(
+        host=os.getenv("POSTGRES_HOSTNAME"),
+        dbname=os.getenv("POSTGRES_DB"),
+        user=os.getenv("POSTGRES_USER"),
+        password=os.getenv("POSTGRES_PASSWORD"),
+        pool_size=1,
+    ).get_engine()
+
+
+def read_db(engine) -> list:
+    with engine.connect() as connection:
+        meeting_ids = connection.execute(
+            text("SELECT meeting_id FROM meeting_transcript")
+        ).scalars().all()
+        draft_ids = connection.execute(
+            text("SELECT draft_id FROM resolution_text")
+        ).scalars().all()
+
+    store = TextStore(engine)
+    start = time.perf_counter()
+    transcripts = store.transcripts(meeting_ids)
+    seconds = time.perf_counter() - start
+    print(f"Reading {len(transcripts)} transcripts from the DB: {seconds * 1000:.0f} ms")
+
+    with engine.connect() as connection:
+        for table in TEXT_TABLES:
+            size = connection.execute(
+                text(f"SELECT pg_total_relation_size('{table}')")
+            ).scalar()
+            print(f"Table {table}: {size / 1024 / 1024:.1f} MB")
+
+    texts = [t for t in transcripts.values() if t]
+    texts += [t for t in store.draft_texts(draft_ids).values() if t]
+    texts += [t for t in store.final_texts(draft_ids).values() if t]
+    return texts
+
+
+def benchmark(texts: list) -> None:
+    plain_size = sum(len(t.encode("utf-8")) for t in texts)
+    print(f"{len(texts)} texts, {plain_size / 1024 / 1024:.1f} MB of plain text")
+    print(f"{'mode':>6} {'size (MB)':>10} {'ratio':>6} {'compress (ms)':>14} {'read (ms)':>10} {'read/text (µs)':>15}")
+
+    for mode in MODES:
+        if mode == ZSTD and zstandard is None:
+            print(f"{mode:>6} skipped, the 'zstandard' package is not installed")
+            continue
+
+        codec = TextCodec(mode)
+        start = time.perf_counter()
+        stored = [codec.encode(t) for t in texts]
+        compress_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for plain, compressed in stored:
+            TextCodec.decode(plain, compressed)
+        read_seconds = time.perf_counter() - start
+
+        size = sum(
+            len(plain.encode("utf-8")) if compressed is None else len(compressed)
+            for plain, compressed in stored
+        )
+        print(
+            f"{mode:>6} {size / 1024 / 1024:>10.1f} {plain_size / size:>6.2f} {compress_seconds * 1000:>14.0f}"
+            f" {read_seconds * 1000:>10.0f} {read_seconds / len(texts) * 1e6:>15.0f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--from-db",
+        help="Use the texts in the database, instead of the PDF text cache",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--text-cache-folder",
+        help="The folder of the PDF text cache",
+        action="store",
+        default=TEXT_CACHE_FOLDER,
+    )
+    args = parser.parse_args()
+
+    texts = read_db(connect()) if args.from_db else read_text_cache(args.text_cache_folder)
+    if len(texts) == 0:
+        print("No texts found")
+        return
+
+    benchmark(texts)
+
+
+if __name__ == "__main__":
+    main()
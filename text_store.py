@@ -0,0 +1,70 @@
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+
+from meeting_transcript import MeetingTranscript
+from resolution_text import ResolutionText
+from text_codec import TextCodec
+
+
+class TextStore:
+    """
+    This class reads the texts of meetings and resolutions from the DB, for the given ids only.
+
+    The texts are kept out of the `meeting` and `resolution` tables, so reading those (or joining them) stays fast.
+    Compressed texts are decompressed, so you always get the plain text.
+    Use this class to add the texts once you know which meetings or resolutions you need them for. E.g.:
+
+        store = TextStore(engine)
+        bosnia_df["full_text"] = bosnia_df["meeting_id"].map(store.transcripts(bosnia_df["meeting_id"]))
+    """
+
+    def __init__(self, engine: Engine) -> None:
+        self.engine: Engine = engine
+
+    def transcripts(self, meeting_ids) -> dict:
+        """
+        :param meeting_ids: the ids of the meetings (any iterable, e.g. a pandas Series)
+        :return: the transcripts of the meetings, by meeting id. Meetings without a transcript are left out.
+        """
+        return self.read(
+            MeetingTranscript.meeting_id,
+            MeetingTranscript.full_text,
+            MeetingTranscript.full_text_compressed,
+            meeting_ids,
+        )
+
+    def draft_texts(self, draft_ids) -> dict:
+        """
+        :param draft_ids: the draft ids of the resolutions
+        :return: the texts of the draft resolutions, by draft id
+        """
+        return self.read(
+            ResolutionText.draft_id,
+            ResolutionText.draft_text,
+            ResolutionText.draft_text_compressed,
+            draft_ids,
+        )
+
+    def final_texts(self, draft_ids) -> dict:
+        """
+        :param draft_ids: the draft ids of the resolutions
+        :return: the texts of the adopted resolutions, by draft id
+        """
+        return self.read(
+            ResolutionText.draft_id,
+            ResolutionText.final_text,
+            ResolutionText.final_text_compressed,
+            draft_ids,
+        )
+
+    def read(self, id_column, text_column, compressed_column, ids) -> dict:
+        ids = list(set(ids))
+        if len(ids) == 0:
+            return {}
+
+        statement = select(id_column, text_column, compressed_column).where(id_column.in_(ids))
+        with self.engine.connect() as connection:
+            return {
+                id: TextCodec.decode(text, compressed)
+                for id, text, compressed in connection.execute(statement)
+            }
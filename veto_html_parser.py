@@ -1,13 +1,33 @@
 from bs4 import BeautifulSoup
+from lxml import html as lxml_html
 import logging
 import re
 
+from veto_index import VetoIndex
+
 logger = logging.getLogger("unsc_db_filler")
 
 
 class VetoHTMLParser:
-    def __init__(self, html: str):
+    """
+    Parses the veto table page. It can use two backends, which give the same result:
+     - `lxml` (the default): fast, using lxml its HTML parser and XPath
+     - `html5lib`: slow, using BeautifulSoup with html5lib, which parses pages exactly like a browser
+    """
+
+    LXML = "lxml"
+    HTML5LIB = "html5lib"
+
+    # Over the years, some states were referenced by multiple names.
+    # This table maps those names to the name we use in the database.
+    NORMALIZATION_TABLE = {
+        "Russian Federation": "Russia",
+        "USSR": "Russia",
+    }
+
+    def __init__(self, html: str, backend: str = LXML):
         self.html = html
+        self.backend = backend
 
     def create_resolution_to_veto_mapping_table(self) -> dict:
         """
@@ -39,6 +59,9 @@ class VetoHTMLParser:
         only get the resolution id, and not other text.
 
         """
+        if self.backend == self.LXML:
+            return self.create_resolution_to_veto_mapping_table_with_lxml()
+
         soup = BeautifulSoup(self.html, "html5lib")
         rows = soup.table.find_all("tr")
 
@@ -75,6 +98,47 @@ class VetoHTMLParser:
 
         return records
 
+    def create_veto_index(self) -> VetoIndex:
+        """
+        Reads the Veto table, and creates an index to find the states which vetoed a draft resolution
+
+        :return: the VetoIndex
+        """
+        return VetoIndex(self.create_resolution_to_veto_mapping_table())
+
+    def create_resolution_to_veto_mapping_table_with_lxml(self) -> dict:
+        """
+        Same as `create_resolution_to_veto_mapping_table`, using lxml.
+
+        :return: A Dictionary which maps a draft resolution to a list of veto voters
+        """
+        table = parse_html(self.html).find(".//table")
+
+        records = {}
+        for row in table.iter("tr"):
+            cells = row.xpath(".//td")
+
+            # First few rows are about the Library..no real data.
+            if len(cells) <= 1:
+                continue
+
+            resolution = cells[1].find(".//a").text_content()
+
+            # The text of the cell, split on its <br> tags, see `create_resolution_to_veto_mapping_table`
+            veto_caster = [cells[4].text] if cells[4].text else []
+            for el in cells[4]:
+                if el.tag != "br":
+                    veto_caster.append(el.text_content())
+                if el.tail:
+                    veto_caster.append(el.tail)
+
+            # Now normalize the entries
+            veto_caster = [self.normalize_state_name(state) for state in veto_caster]
+
+            records[resolution] = veto_caster
+
+        return records
+
     def normalize_state_name(self, state_name: str) -> str:
         """
         Takes a state name and normalizes it. This is used as over the years for example
@@ -83,14 +147,20 @@ class VetoHTMLParser:
         :param state_name: The name of the state
         :return: The normalized name of the state
         """
-        normalization_table = {
-            "Russian Federation": "Russia",
-            "USSR": "Russia",
-        }
-
         # If the passed state_name is found in our mapping table,
         # we need to normalize it. Normalize and then return that result
-        if state_name in normalization_table.keys():
-            return normalization_table.get(state_name.strip())
+        if state_name in self.NORMALIZATION_TABLE.keys():
+            return self.NORMALIZATION_TABLE.get(state_name.strip())
 
         return state_name.strip()
+
+
+def parse_html(html: str):
+    """
+    Parses a page with lxml, the way a browser (and html5lib) would where it matters for the UNSC pages.
+
+    :param html: the html of the page
+    :return: the root element of the page
+    """
+    # Browsers read a (wrong) </br> as a <br>, lxml drops it. The veto table uses it between states.
+    return lxml_html.document_fromstring(re.sub(r"</br\s*>", "<br>", html, flags=re.IGNORECASE))
@@ -0,0 +1,77 @@
+from typing import NamedTuple
+
+import bisect
+import re
+
+
+class Veto(NamedTuple):
+    # The draft resolution, as it is listed in the veto table (canonicalised, see `VetoIndex.canonical`)
+    draft_id: str
+    # The (normalized) names of the permanent members which vetoed it
+    vetoed_by: list
+
+
+class VetoIndex:
+    """
+    This class finds the states which vetoed a draft resolution, as listed in the veto table.
+    It is built by `VetoHTMLParser.create_veto_index`.
+
+    The meeting tables and the veto table don't always refer to a draft resolution the same way.
+    For example, S/PV.2686 discussed draft resolution S/18087 according to
+    https://www.un.org/depts/dhl/resguide/scact1986_table_en.html, while the veto table lists S/18087/Rev.1.
+    When there is no exact match, `find` looks for the revisions or corrections of the draft resolution
+    (S/18087/Rev.1, S/3188/Corr.1, ...), in a sorted list of all draft resolutions, and the other way around.
+
+    The index is read-only, so it can be shared by all workers.
+    """
+
+    _SUFFIX = re.compile(r"/(?:Rev|Corr)\.[0-9]+$")
+    _WHITESPACE = re.compile(r"\s+")
+
+    def __init__(self, table: dict) -> None:
+        """
+        :param table: maps the draft resolutions of the veto table to the states which vetoed them
+        """
+        self.vetoes: dict = {}
+        for draft_id, vetoed_by in table.items():
+            draft_id = self.canonical(draft_id)
+            self.vetoes[draft_id] = Veto(draft_id, vetoed_by)
+
+        self.draft_ids: list = sorted(self.vetoes.keys())
+
+    def __len__(self) -> int:
+        return len(self.vetoes)
+
+    def find(self, draft_id: str) -> Veto:
+        """
+        Finds a draft resolution in the veto table: first as is, then its revisions and corrections.
+        If it is a revision or correction itself, the same for the draft resolution it revises or corrects.
+
+        :param draft_id: the draft resolution, as mentioned in a meeting table
+        :return: the Veto of the draft resolution, or None if it is not in the veto table
+        """
+        draft_id = self.canonical(draft_id)
+
+        # The draft resolution itself, or the draft resolution it is a revision or correction of
+        for candidate in dict.fromkeys([draft_id, self._SUFFIX.sub("", draft_id)]):
+            veto = self.vetoes.get(candidate)
+            if veto is not None:
+                return veto
+
+            # Revisions and corrections sort right after the draft resolution itself
+            prefix = f"{candidate}/"
+            index = bisect.bisect_left(self.draft_ids, prefix)
+            if index < len(self.draft_ids) and self.draft_ids[index].startswith(prefix):
+                # S/2019 is not a revision of S/2019/961
+                if self._SUFFIX.match(self.draft_ids[index], len(candidate)):
+                    return self.vetoes[self.draft_ids[index]]
+
+        return None
+
+    @classmethod
+    def canonical(cls, draft_id: str) -> str:
+        """
+        :param draft_id: the id of a draft resolution
+        :return: the id without any whitespace (the pages have trailing spaces in some of them)
+        """
+        return cls._WHITESPACE.sub("", draft_id)
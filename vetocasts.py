@@ -17,7 +17,8 @@ class VetoCasts(Base):
     vetoed_resolution = Column(
         String, ForeignKey("resolution.draft_id"), primary_key=True
     )
-    state_id = Column(Integer, ForeignKey("state.state_id"), primary_key=True)
+    # The primary key starts with the resolution, so looking up the vetoes of a state needs an index of its own
+    state_id = Column(Integer, ForeignKey("state.state_id"), primary_key=True, index=True)
 
     resolution = relationship("Resolution", backref=backref("vetocasts"))
     state = relationship("State", backref=backref("vetocasts"))